@@ -1,18 +1,33 @@
 """ Module for Mancala AI Profiles. """
 
+import multiprocessing
+import time
 from random import choice
-from os import sys
 
 from mancala import Player, reverse_index
-from constants import AI_NAME, P1_PITS, P2_PITS, AI_DEPTH_1, AI_DEPTH_2, HILLCLIMB
+from constants import AI_NAME, P1_PITS, P2_PITS, AI_DEPTH_1, AI_DEPTH_2, HILLCLIMB, \
+    AI_TIME_BUDGET, AI_MAX_DEPTH, AI_PROCESSES, ENDGAME_DB, OPENING_BOOK, \
+    MCTS_PLAYOUTS, MCTS_TIME_BUDGET, MCTS_EXPLORATION, EVAL_WEIGHTS, SEARCH_CACHE, \
+    NETWORK_FILE
 from tree import Node
-import copy
+from search import AlphaBetaSearch, SearchStats, store_lead
+from flatboard import FlatBoard
+from transposition import TranspositionTable
+from mcts import MonteCarloSearch
+from evaluation import EvalBoard, Evaluator
+import cache
+import endgame
+import opening
 
 class AIPlayer(Player):
     """ Base class for an AI Player """
     def __init__(self, number, board, name=AI_NAME):
         """ Initializes an AI profile. """
         super(AIPlayer, self).__init__(number, board, name)
+        self.book = None
+        self.cache = None
+        # SearchStats of every move chosen by searching, in order.
+        self.move_stats = []
 
     @property
     def pits(self):
@@ -35,12 +50,13 @@ class AIPlayer(Player):
     def eligible_free_turns(self):
         """ Returns a list of indexes representing eligible free turns. """
 
-        free_turn_indices = range(1, 7)
+        num_pits = len(self.pits)
+        free_turn_indices = range(1, num_pits + 1)
         free_turn_indices.reverse()
 
         elig_free_turns = []
 
-        for i in range(0, 6):
+        for i in range(0, num_pits):
             if self.pits[i] == free_turn_indices[i]:
                 elig_free_turns.append(1)
             else:
@@ -49,11 +65,56 @@ class AIPlayer(Player):
         return elig_free_turns
 
     def _think(self):
-        """ Slight delay for thinking. """
-        import time
+        """ Slight delay for thinking, skipped on headless boards. """
+        if self.board.headless:
+            return
         print "AI is thinking..."
         time.sleep(2)
 
+    def _book_move(self, position):
+        """ Returns the opening book move for position, or None. """
+        if self.book is None:
+            return None
+        return self.book.probe(position, self.number)
+
+    def cache_tag(self):
+        """ Returns the name this AI's results are cached under. Results
+        are only shared between AIs that would search alike.
+        """
+        variant = self.board.variant
+        tag = "%s/%d/%d:%d" % (self.__class__.__name__, self.number,
+                               variant.pits, variant.flags)
+        if getattr(self, 'endgame', None) is not None:
+            tag += "/endgame"
+        return tag
+
+    def _cached_move(self, position, depth):
+        """ Returns the cached move for position searched to depth, or None. """
+        if self.cache is None:
+            return None
+        result = self.cache.lookup(self.cache_tag(), position, self.number, depth)
+        if result is None:
+            return None
+        return result[1]
+
+    def _cache_result(self, position, depth, score, move):
+        """ Stores a search result in the cache, if there is one. """
+        if self.cache is not None and move is not None:
+            self.cache.store(self.cache_tag(), position, self.number, depth,
+                             score, move)
+
+    def _record(self, stats, start):
+        """ Stores the stats of the move just chosen, timed from start
+        (a time.time() value).
+        """
+        stats.elapsed = time.time() - start
+        self.move_stats.append(stats)
+
+    def _say(self, message):
+        """ Prints message unless the board is headless. """
+        if not self.board.headless:
+            print message
+
 class RandomAI(AIPlayer):
     """ AI Profile that randomly selects from eligible moves. """
 
@@ -72,31 +133,68 @@ class VectorAI(AIPlayer):
 
         self._think()
 
-        reverse_indices = range(0, 6)
+        num_pits = len(self.pits)
+        reverse_indices = range(0, num_pits)
         reverse_indices.reverse()
 
         # First optimize for free moves.
         for i in reverse_indices:
             if self.eligible_free_turns[i] == 1:
-                if self.pits[i] == reverse_index(i) + 1:
-                    print "VectorAI, mode 1, playing: " + str(i)
+                if self.pits[i] == reverse_index(i, num_pits) + 1:
+                    self._say("VectorAI, mode 1, playing: " + str(i))
                     return i
         # Then clear out inefficient pits.
         for i in reverse_indices:
-            if self.pits[i] > reverse_index(i) + 1:
-                print "VectorAI, mode 2, playing: " + str(i)
+            if self.pits[i] > reverse_index(i, num_pits) + 1:
+                self._say("VectorAI, mode 2, playing: " + str(i))
                 return i
         # Finally, select a random eligible move.
-        print "VectorAI, mode 3, playing an eligible move."
+        self._say("VectorAI, mode 3, playing an eligible move.")
         return choice(self.eligible_moves)
 
-#Here is a simple minimax AI without pruning, maybe plan to prune with above tree idea
+class MonteCarloAI(AIPlayer):
+    """ AI Profile using Monte Carlo tree search with random playouts. """
+
+    def __init__(self, num, b):
+        super(MonteCarloAI, self).__init__(num, b)
+        self.playouts = MCTS_PLAYOUTS
+        # Milliseconds per move; None plays a fixed number of playouts.
+        self.time_budget = MCTS_TIME_BUDGET
+        # Kept between moves so the tree is reused.
+        self.search = MonteCarloSearch(MCTS_EXPLORATION)
+
+    def get_next_move(self):
+        """ Returns the most visited move after searching. """
+
+        self._think()
+
+        start = time.time()
+        self.search.stats = stats = SearchStats()
+        position = FlatBoard.from_board(self.board.board, self.board.variant)
+        move = self.search.choose_move(position, self.number, self.playouts,
+                                       self.time_budget)
+        self._record(stats, start)
+        return move
+
+# Minimax AI; get_next_move searches with alpha-beta pruning, while
+# build_game_tree and minimax remain for inspecting the full tree.
 class MinimaxAI(AIPlayer):
     """AI Profile Uses a Simple minimax algorthim"""
 
+    # Board class searched by get_next_move.
+    position_type = FlatBoard
 
     def __init__(self, num, b):
         super(MinimaxAI, self).__init__(num, b)
+        self.table = TranspositionTable()
+        self.endgame = endgame.load(ENDGAME_DB) if ENDGAME_DB else None
+        self.book = opening.load(OPENING_BOOK) if OPENING_BOOK else None
+        self.cache = cache.load(SEARCH_CACHE) if SEARCH_CACHE else None
+        # Milliseconds per move; None searches to the fixed depth.
+        self.time_budget = AI_TIME_BUDGET
+        # Processes for fixed depth searches; the pool starts on first use.
+        self.processes = AI_PROCESSES
+        self.parallel = None
 
 
     def get_pits_for_board(self, board, number):
@@ -121,91 +219,160 @@ class MinimaxAI(AIPlayer):
             return 1
 
     def build_game_tree(self, depth, board, is_max, number):
-        cpy = copy.deepcopy(board)
-        r = Node(cpy, is_max, None)
-
-        if depth == 0 :
-            return r
-
-        el_moves = self.get_eligible_for_board(cpy, number)
-        for move in el_moves:
-            new_board, free_move = self.board._dummy_move_stones(number, move, cpy)
-            r_num = number if free_move else self.flip_number(number)
-            ci = self.build_game_tree(depth-1, new_board, (is_max if free_move else not is_max), r_num)
-            ci.set_move(move)
-            r.add_child(ci)       
-
-        return r
+        return Node(FlatBoard.from_board(board, self.board.variant), is_max, number, depth)
 
     def get_next_move(self):
         self._think()
 
-        cpy = copy.deepcopy(self.board.board)
         if self.number == 1:
             #Player 1
             depth = AI_DEPTH_1
         else:
             depth = AI_DEPTH_2
-        tree = self.build_game_tree(depth, cpy, True, self.number)
-        score, move = self.minimax(tree)
+        start = time.time()
+        stats = SearchStats()
+        position = self.position_type.from_board(self.board.board, self.board.variant)
+        move = self._book_move(position)
+        if move is None and not self.time_budget:
+            move = self._cached_move(position, depth)
+        if move is not None:
+            self._record(stats, start)
+            return move
+
+        engine = self.make_engine()
+        engine.stats = stats
+        if self.time_budget:
+            score, move, depth = engine.iterative_deepening(
+                position, self.number, self.time_budget, AI_MAX_DEPTH)
+        elif self.processes > 1 and not multiprocessing.current_process().daemon:
+            # Pool workers (as in tournaments) cannot start processes of
+            # their own, so they search serially instead.
+            if self.parallel is None:
+                from parallel import ParallelSearch
+                self.parallel = ParallelSearch(self.__class__, self.number,
+                                               self.processes)
+            score, move = self.parallel.search(position, depth, engine)
+        else:
+            score, move = engine.search(position, self.number, depth)
+        self._cache_result(position, depth, score, move)
+        self._record(stats, start)
         return move
 
+    def close(self):
+        """ Shuts down the parallel search workers, if started. """
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
 
-    def evaluate_board(self, node):
 
-        ai_win = False
-        p_win = False
+    def make_engine(self):
+        """ Returns a search engine using this AI's evaluation and tables. """
+        return AlphaBetaSearch(self.evaluate_position, table=self.table,
+                               endgame=self.endgame)
 
-        if set(node.value[P2_PITS]) == set([0]):
-            ai_win = True
-        #If either player is empty.
-        elif set(node.value[P1_PITS]) == set([0]):
-            p_win =  True
-        #else game is not over
-        else:
-            ai_win = False
-            p_win = False
-        if node.max:
-            score = node.value[3][0] - node.value[1][0]
-        else:
-            score = node.value[1][0] - node.value[3][0]
 
-        if ai_win:
-            score = 150
-        elif p_win:
-            score = -150
+    def evaluate_board(self, node):
+        return self.evaluate_position(node.position(), node.max)
+
 
-        return score
+    def evaluate_position(self, position, is_max):
+        """ Returns this AI's store lead, exact once the game is over. """
+        return store_lead(position, self.number)
 
 
     def minimax(self, node):
-        if len(node.children) == 0:
+        best = None
+        best_move = None
+        if node.max:
+            for child in node.children:
+                next, next_move = self.minimax(child)
+                if best is None or next >= best:
+                    best = next
+                    best_move = child.move
+        else:
+            for child in node.children:
+                next, next_move = self.minimax(child)
+                if best is None or next <= best:
+                    best = next
+                    best_move = child.move
+        if best is None:
             #Leaf, eval board
             score = self.evaluate_board(node)
             return score, node.move
-        else:
-            if node.max:
-                best = -sys.maxint - 1
-                best_move = None
-                for child in node.children:
-                    next, next_move = self.minimax(child)
-                    best = next if next >= best else best
-                    best_move = child.move if next >= best else best_move
-                return best, best_move
-            else:
-                best = sys.maxint
-                best_move = None
-                for child in node.children:
-                    next, next_move = self.minimax(child)
-                    best = next if next <= best else best
-                    best_move = child.move if next <= best else best_move
-                return best, best_move
+        return best, best_move
+
+class HeuristicAI(MinimaxAI):
+    """ AI Profile searching like MinimaxAI, scoring leaves with the
+    weighted features of evaluation.py.
+    """
+
+    position_type = EvalBoard
+
+    def __init__(self, num, b):
+        super(HeuristicAI, self).__init__(num, b)
+        self.weights = EVAL_WEIGHTS
+
+    def cache_tag(self):
+        """ Returns the name this AI's results are cached under, which
+        includes its weights.
+        """
+        return "%s/%s" % (super(HeuristicAI, self).cache_tag(),
+                          ",".join("%r" % weight for weight in self.weights))
+
+    def make_engine(self):
+        """ Returns a search engine using the feature evaluation. """
+        return AlphaBetaSearch(Evaluator(self.number, self.weights),
+                               table=self.table, endgame=self.endgame)
+
+class NeuralAI(MinimaxAI):
+    """ AI Profile searching like MinimaxAI, scoring leaves with the
+    network of neural.py stored in NETWORK_FILE.
+    """
+
+    def __init__(self, num, b):
+        super(NeuralAI, self).__init__(num, b)
+        # NumPy is only needed once a NeuralAI is used.
+        import neural
+        self.network = neural.load(NETWORK_FILE)
+        self.network_digest = self.network.digest()
+        if b is not None:
+            self._check_variant()
+
+    def _check_variant(self):
+        """ Raises ValueError unless the network was trained for the
+        variant being played.
+        """
+        if self.network.variant != self.board.variant:
+            raise ValueError("%s was trained for %r, not %r" % (
+                NETWORK_FILE, self.network.variant, self.board.variant))
+
+    def get_next_move(self):
+        self._check_variant()
+        return super(NeuralAI, self).get_next_move()
+
+    def cache_tag(self):
+        """ Returns the name this AI's results are cached under, which
+        includes a hash of its network's weights.
+        """
+        return "%s/%s" % (super(NeuralAI, self).cache_tag(), self.network_digest)
+
+    def make_engine(self):
+        """ Returns a search engine scoring leaves with the network, in
+        batches.
+        """
+        from neural import NetworkEvaluator
+        return AlphaBetaSearch(NetworkEvaluator(self.number, self.network),
+                               table=self.table, endgame=self.endgame)
 
 class HillSearchAI(AIPlayer):
 
     def __init__(self, num, b):
         super(HillSearchAI, self).__init__(num, b)
         self.depth = HILLCLIMB
+        self.table = TranspositionTable()
+        self.endgame = endgame.load(ENDGAME_DB) if ENDGAME_DB else None
+        self.book = opening.load(OPENING_BOOK) if OPENING_BOOK else None
+        self.cache = cache.load(SEARCH_CACHE) if SEARCH_CACHE else None
 
 
     def get_pits_for_board(self, board, number):
@@ -230,61 +397,63 @@ class HillSearchAI(AIPlayer):
             return 1
 
     def build_game_tree(self, depth, board, is_max, number):
-        cpy = copy.deepcopy(board)
-        r = Node(cpy, is_max, None)
-
-        if depth == 0 :
-            return r
-
-        el_moves = self.get_eligible_for_board(cpy, number)
-        for move in el_moves:
-            new_board, free_move = self.board._dummy_move_stones(number, move, cpy)
-            r_num = number if free_move else self.flip_number(number)
-            new_depth = depth - 1 if not free_move else depth
-            ci = self.build_game_tree(new_depth, new_board, (is_max if free_move else not is_max), r_num)
-            ci.set_move(move)
-            r.add_child(ci)       
-
-        return r
+        return Node(FlatBoard.from_board(board, self.board.variant), is_max, number, depth,
+                    extend_free_moves=True)
 
 
     def get_next_move(self):
         self._think()
 
-        cpy = copy.deepcopy(self.board.board)
-        tree = self.build_game_tree(HILLCLIMB, cpy, True, self.number)
-        score, move = self.minimax(tree)
+        start = time.time()
+        stats = SearchStats()
+        position = FlatBoard.from_board(self.board.board, self.board.variant)
+        move = self._book_move(position)
+        if move is None:
+            move = self._cached_move(position, HILLCLIMB)
+        if move is not None:
+            self._record(stats, start)
+            return move
+
+        engine = self.make_engine()
+        engine.stats = stats
+        score, move = engine.search(position, self.number, HILLCLIMB)
+        self._cache_result(position, HILLCLIMB, score, move)
+        self._record(stats, start)
         return move
 
 
+    def make_engine(self):
+        """ Returns a search engine using this AI's evaluation and tables. """
+        return AlphaBetaSearch(self.evaluate_position, extend_free_moves=True,
+                               table=self.table, endgame=self.endgame)
+
+
     def evaluate_board(self, node):
-        if node.max:
-            score = node.value[3][0] - node.value[1][0]
-        else:
-            score = node.value[1][0] - node.value[3][0]
+        return self.evaluate_position(node.position(), node.max)
 
-        return abs(score)
+
+    def evaluate_position(self, position, is_max):
+        """ Returns this AI's store lead, exact once the game is over. """
+        return store_lead(position, self.number)
 
 
     def minimax(self, node):
-        if len(node.children) == 0:
+        best = None
+        best_move = None
+        if node.max:
+            for child in node.children:
+                next, next_move = self.minimax(child)
+                if best is None or next >= best:
+                    best = next
+                    best_move = child.move
+        else:
+            for child in node.children:
+                next, next_move = self.minimax(child)
+                if best is None or next <= best:
+                    best = next
+                    best_move = child.move
+        if best is None:
             #Leaf, eval board
             score = self.evaluate_board(node)
             return score, node.move
-        else:
-            if node.max:
-                best = -sys.maxint - 1
-                best_move = None
-                for child in node.children:
-                    next, next_move = self.minimax(child)
-                    best = next if next >= best else best
-                    best_move = child.move if next >= best else best_move
-                return best, best_move
-            else:
-                best = sys.maxint
-                best_move = None
-                for child in node.children:
-                    next, next_move = self.minimax(child)
-                    best = next if next <= best else best
-                    best_move = child.move if next <= best else best_move
-                return best, best_move
\ No newline at end of file
+        return best, best_move
\ No newline at end of file
@@ -0,0 +1,147 @@
+""" Batch analysis of positions without a Board or Match.
+
+Positions are written compactly as their FlatBoard cells and the
+player to move, e.g. the starting position with player 1 to move is
+
+    4,4,4,4,4,4,0,4,4,4,4,4,4,0:1
+
+analyze searches one position with a search AI profile's engine, to a
+fixed depth or for a time budget, and returns its best move, score
+and principal variation. analyze_many spreads a stream of positions
+over a process pool and yields each Analysis as soon as it is done.
+Every position is searched with an emptied transposition table, so a
+result does not depend on which positions were searched before it.
+
+Usage: python analysis.py PROFILE DEPTH [TIME_BUDGET] < POSITIONS
+where PROFILE is M (Minimax), H (HillSearch), E (Heuristic) or N
+(Neural), and POSITIONS has one position per line. Results are printed
+as JSON, one line per position, in the order they finish.
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import json
+import multiprocessing
+import sys
+import time
+
+from flatboard import FlatBoard
+from search import SearchStats, get_engine
+from variants import STANDARD
+
+
+def encode_position(position, number):
+    """ Returns the compact text form of a FlatBoard with player number
+    to move.
+    """
+    return "%s:%d" % (",".join(str(stones) for stones in position.cells), number)
+
+
+def decode_position(text, variant=STANDARD, position_type=FlatBoard):
+    """ Returns (position, number) for the compact text form of a
+    position, as a position_type board of variant.
+    """
+    cells, number = text.strip().split(":")
+    cells = [int(stones) for stones in cells.split(",")]
+    if len(cells) != variant.pits * 2 + 2:
+        raise ValueError("Expected %d cells, got %d: %s" %
+                         (variant.pits * 2 + 2, len(cells), text))
+    number = int(number)
+    if number not in (1, 2):
+        raise ValueError("Unknown player to move: %s" % text)
+    return position_type(cells=cells, variant=variant), number
+
+
+class Analysis(object):
+    """ The search result for one position.
+
+    index: place of the position in the analyzed sequence
+    move: best move, None when the game is over
+    score: search score, as the profile's evaluation gives it
+    pv: principal variation as (player number, move) pairs
+    depth: depth searched, the deepest completed with a time budget
+    """
+
+    def __init__(self, index, position, move, score, pv, depth, stats):
+        self.index = index
+        self.position = position
+        self.move = move
+        self.score = score
+        self.pv = pv
+        self.depth = depth
+        self.stats = stats
+
+    def as_dict(self):
+        """ Returns the analysis as a plain dict, for JSON output. """
+        return {
+            'index': self.index,
+            'position': self.position,
+            'move': self.move,
+            'score': self.score,
+            'pv': self.pv,
+            'depth': self.depth,
+            'nodes': self.stats.generated,
+            'seconds': self.stats.elapsed,
+        }
+
+
+def analyze(text, profile_type, depth, time_budget=None, index=0,
+            variant=STANDARD):
+    """ Searches the position in text with profile_type's engine.
+
+    depth: depth searched, or the deepest allowed with time_budget
+    time_budget: milliseconds, searching iteratively deeper when given
+    """
+    position_type = getattr(profile_type, 'position_type', FlatBoard)
+    position, number = decode_position(text, variant, position_type)
+    engine = get_engine(profile_type, number)
+    engine.table.clear()
+    engine.stats = stats = SearchStats()
+
+    start = time.time()
+    if position.game_over():
+        depth = 0
+        score, move = engine.search(position, number, depth)
+    elif time_budget:
+        score, move, depth = engine.iterative_deepening(position, number,
+                                                        time_budget, depth)
+    else:
+        score, move = engine.search(position, number, depth)
+    pv = engine.principal_variation(position, number, move, depth)
+    stats.elapsed = time.time() - start
+    return Analysis(index, text.strip(), move, score, pv, depth, stats)
+
+
+def _analyze_task(task):
+    """ Worker entry point for analyze_many. """
+    index, text, profile_type, depth, time_budget, variant = task
+    return analyze(text, profile_type, depth, time_budget, index, variant)
+
+
+def analyze_many(texts, profile_type, depth, time_budget=None,
+                 processes=None, variant=STANDARD):
+    """ Analyzes an iterable of positions in text form across a process
+    pool, yielding each Analysis as it finishes. Results can arrive out
+    of order; their index gives the position's place in texts.
+    """
+    tasks = ((index, text, profile_type, depth, time_budget, variant)
+             for index, text in enumerate(texts) if text.strip())
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap_unordered(_analyze_task, tasks):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+if __name__ == '__main__':
+    from tournament import PROFILES
+    profile_type = PROFILES[sys.argv[1]]
+    time_budget = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    for analysis in analyze_many(sys.stdin, profile_type, int(sys.argv[2]),
+                                 time_budget):
+        print json.dumps(analysis.as_dict())
+        sys.stdout.flush()
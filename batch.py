@@ -0,0 +1,199 @@
+""" Vectorized move generation over many boards at once with NumPy.
+
+Positions are rows of an (N, size) integer array laid out like
+FlatBoard.cells, so with six pits a batch is N x 14. Every function
+works on whole batches: one call moves, scores or plays out every
+row, which is what search frontier expansion and random playouts
+need.
+"""
+import numpy as np
+
+from board import InvalidMove
+from search import SOLVED_SCORE
+from variants import REMAINING_TO_OWNER, STANDARD, get_tables
+
+# Sowing tables as arrays, keyed by pit count.
+_ARRAYS = {}
+
+
+def _get_arrays(pits):
+    """ Returns the (cached) sowing tables for pits as NumPy arrays.
+
+    cycle[number, index, k] is the slot the k+1th stone from pit index
+    lands in, and distance[number, index, slot] is how many stones it
+    takes to reach slot (0 for the skipped opposing store).
+    """
+    arrays = _ARRAYS.get(pits)
+    if arrays is not None:
+        return arrays
+
+    tables = get_tables(pits)
+    size = tables['size']
+    cycle = np.zeros((3, pits, size - 1), dtype=np.intp)
+    distance = np.zeros((3, pits, size), dtype=np.intp)
+    for number in (1, 2):
+        for index in range(pits):
+            slots = tables['sow'][number][index]
+            cycle[number, index] = slots
+            for k, slot in enumerate(slots):
+                distance[number, index, slot] = k + 1
+
+    # Stores have no opposite pit; point them at themselves.
+    opposite = np.array([slot if other is None else other
+                         for slot, other in enumerate(tables['opposite'])],
+                        dtype=np.intp)
+    arrays = {
+        'size': size,
+        'cycle': cycle,
+        'distance': distance,
+        'offsets': np.array([0, tables['offsets'][1], tables['offsets'][2]], dtype=np.intp),
+        'stores': np.array([0, tables['stores'][1], tables['stores'][2]], dtype=np.intp),
+        'opposite': opposite,
+        'owner': np.array(tables['owner'], dtype=np.intp),
+    }
+    _ARRAYS[pits] = arrays
+    return arrays
+
+
+def from_boards(boards):
+    """ Returns an (N, size) position array for a list of FlatBoards. """
+    return np.array([board.cells.tolist() for board in boards], dtype=np.int32)
+
+
+def pits_of(positions, numbers, variant=STANDARD):
+    """ Returns the (N, pits) pit counts of player numbers[i] in row i. """
+    pits = variant.pits
+    numbers = np.broadcast_to(numbers, (len(positions),))
+    offsets = _get_arrays(pits)['offsets'][numbers]
+    return positions[np.arange(len(positions))[:, None],
+                     offsets[:, None] + np.arange(pits)]
+
+
+def eligible(positions, numbers, variant=STANDARD):
+    """ Returns an (N, pits) mask of the moves player numbers[i] can make. """
+    return pits_of(positions, numbers, variant) > 0
+
+
+def move_batch(positions, numbers, moves, variant=STANDARD):
+    """ Moves stones in every row of positions at once.
+
+    positions: (N, size) integer array, left unchanged
+    numbers: player number moving in each row (array or scalar)
+    moves: pit index moved from in each row
+
+    Returns: new positions, earned free move flags, stones captured
+    from the opposite pit (0 where there was no capture).
+    """
+    arrays = _get_arrays(variant.pits)
+    count = len(positions)
+    rows = np.arange(count)
+    numbers = np.broadcast_to(np.asarray(numbers, dtype=np.intp), (count,))
+    moves = np.asarray(moves, dtype=np.intp)
+
+    starts = arrays['offsets'][numbers] + moves
+    stones = positions[rows, starts]
+    if not stones.all():
+        raise InvalidMove
+
+    new = positions.copy()
+    new[rows, starts] = 0
+
+    cycle_length = arrays['size'] - 1
+    laps, remainder = np.divmod(stones, cycle_length)
+    distance = arrays['distance'][numbers, moves]
+    received = laps[:, None] + (distance <= remainder[:, None])
+    received[distance == 0] = 0
+    new += received
+
+    last = arrays['cycle'][numbers, moves, (stones - 1) % cycle_length]
+    stores = arrays['stores'][numbers]
+    free_moves = last == stores
+
+    # Last stone in an empty pit of our own captures the opposite pit.
+    opposite = arrays['opposite'][last]
+    captured = new[rows, opposite]
+    captures = ((arrays['owner'][last] == numbers) & (new[rows, last] == 1) &
+                ((captured > 0) | variant.empty_capture) & ~free_moves)
+    captured = np.where(captures, captured, 0)
+    new[rows, last] -= captures
+    new[rows, opposite] -= captured
+    new[rows, stores] += captured + captures
+
+    return new, free_moves, captured
+
+
+def finished(positions, variant=STANDARD):
+    """ Returns a mask of rows where either player's pits are empty. """
+    pits = variant.pits
+    arrays = _get_arrays(pits)
+    p1 = positions[:, arrays['offsets'][1]:arrays['offsets'][1] + pits].sum(axis=1)
+    p2 = positions[:, arrays['offsets'][2]:arrays['offsets'][2] + pits].sum(axis=1)
+    return (p1 == 0) | (p2 == 0)
+
+
+def gather_remaining(positions, variant=STANDARD):
+    """ Returns positions with the remaining stones moved to the stores
+    by the variant's rule, as at the end of a match.
+    """
+    pits = variant.pits
+    arrays = _get_arrays(pits)
+    new = positions.copy()
+    remaining = [None]
+    for number in (1, 2):
+        offset = arrays['offsets'][number]
+        remaining.append(new[:, offset:offset + pits].sum(axis=1))
+        new[:, offset:offset + pits] = 0
+    if variant.remaining == REMAINING_TO_OWNER:
+        new[:, arrays['stores'][1]] += remaining[1]
+        new[:, arrays['stores'][2]] += remaining[2]
+    else:
+        # Only one side has stones left; they go to the other side.
+        new[:, arrays['stores'][1]] += remaining[2]
+        new[:, arrays['stores'][2]] += remaining[1]
+    return new
+
+
+def evaluate_batch(positions, number, variant=STANDARD):
+    """ Batched MinimaxAI.evaluate_position: the store lead of player
+    number, scored like search.solved_score once a side is empty.
+    """
+    arrays = _get_arrays(variant.pits)
+    stores = arrays['stores']
+    done = finished(positions, variant)
+    final = np.where(done[:, None], gather_remaining(positions, variant), positions)
+    lead = (final[:, stores[1]].astype(np.intp) - final[:, stores[2]])
+    if number == 2:
+        lead = -lead
+    solved = lead + np.sign(lead) * SOLVED_SCORE
+    return np.where(done, solved, lead)
+
+
+def random_moves(positions, numbers, rng, variant=STANDARD):
+    """ Returns a uniformly random eligible move for every row. Rows
+    without an eligible move get move 0.
+    """
+    mask = eligible(positions, numbers, variant)
+    weights = rng.random_sample(mask.shape) * mask
+    return weights.argmax(axis=1)
+
+
+def random_playouts(positions, numbers, rng, variant=STANDARD):
+    """ Plays every row out to the end with random moves.
+
+    Returns: final positions with remaining stones gathered, and the
+    number of moves played in each row.
+    """
+    positions = positions.copy()
+    numbers = np.array(np.broadcast_to(numbers, (len(positions),)), dtype=np.intp)
+    moves_played = np.zeros(len(positions), dtype=np.int32)
+    active = ~finished(positions, variant)
+    while active.any():
+        rows = np.flatnonzero(active)
+        moving = numbers[rows]
+        moves = random_moves(positions[rows], moving, rng, variant)
+        new, free_moves, captured = move_batch(positions[rows], moving, moves, variant)
+        positions[rows] = new
+        numbers[rows] = np.where(free_moves, moving, 3 - moving)
+        moves_played[rows] += 1
+        active[rows] = ~finished(new, variant)
+    return gather_remaining(positions, variant), moves_played
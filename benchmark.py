@@ -0,0 +1,201 @@
+""" Benchmark suite for move generation, search and full games.
+
+Every benchmark is seeded, so runs on different commits move through
+the same positions and play the same games. Results are written as
+JSON for comparing runs against each other.
+
+Usage: python benchmark.py [FILENAME]
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from board import Board
+from flatboard import FlatBoard
+from mancala import Match
+from ai_profiles import HillSearchAI, MinimaxAI, MonteCarloAI, RandomAI
+from perft import perft
+from search import SearchStats, flip_number
+
+FILENAME = "benchmark.json"
+SEED = 1
+
+# Fixed positions as (name, FlatBoard cells, player to move).
+POSITIONS = [
+    ('start', [4, 4, 4, 4, 4, 4, 0, 4, 4, 4, 4, 4, 4, 0], 1),
+    ('opening', [6, 0, 1, 8, 1, 7, 3, 0, 1, 7, 1, 7, 2, 4], 2),
+    ('midgame', [1, 0, 1, 5, 5, 3, 9, 0, 1, 4, 6, 4, 1, 8], 1),
+]
+
+# Moves made by the move generation benchmarks.
+MOVE_SAMPLES = 20000
+PERFT_DEPTHS = (1, 2, 3, 4, 5)
+SEARCH_DEPTHS = (2, 4, 6)
+# Searches timed per profile, position and depth; the median is kept.
+SEARCH_REPEATS = 3
+# (player 1, player 2, games) played by the full game benchmark.
+GAMES = [
+    (RandomAI, RandomAI, 200),
+    (MinimaxAI, RandomAI, 10),
+    (HillSearchAI, RandomAI, 10),
+    (MonteCarloAI, RandomAI, 2),
+]
+
+
+def revision():
+    """ Returns the git commit of the working tree, or None. """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def random_moves(samples, seed=SEED):
+    """ Returns (board state, player number, move) for samples moves
+    from seeded random games, starting a new game whenever one ends.
+    """
+    rng = random.Random(seed)
+    moves = []
+    position = FlatBoard()
+    number = 1
+    while len(moves) < samples:
+        move = rng.choice(position.eligible_moves(number))
+        moves.append((position.to_board(), number, move))
+        free_move, undo = position.make_move(number, move)
+        if position.game_over():
+            position = FlatBoard()
+            number = 1
+        elif not free_move:
+            number = flip_number(number)
+    return moves
+
+
+def bench_move_generation(samples=MOVE_SAMPLES):
+    """ Times Board._dummy_move_stones against FlatBoard
+    make_move/unmake_move over the same moves.
+    """
+    moves = random_moves(samples)
+    board = Board(headless=True)
+    start = time.time()
+    for state, number, move in moves:
+        board._dummy_move_stones(number, move, state)
+    dummy_elapsed = time.time() - start
+
+    positions = [(FlatBoard.from_board(state), number, move)
+                 for state, number, move in moves]
+    start = time.time()
+    for position, number, move in positions:
+        free_move, undo = position.make_move(number, move)
+        position.unmake_move(undo)
+    flat_elapsed = time.time() - start
+
+    return {
+        'moves': samples,
+        'dummy_move_stones_per_sec': samples / dummy_elapsed,
+        'flatboard_moves_per_sec': samples / flat_elapsed,
+    }
+
+
+def bench_perft(depths=PERFT_DEPTHS):
+    """ Counts and times perft from every fixed position. """
+    results = []
+    for name, cells, number in POSITIONS:
+        for depth in depths:
+            position = FlatBoard(cells=cells)
+            start = time.time()
+            nodes = perft(position, number, depth)
+            elapsed = time.time() - start
+            results.append({
+                'position': name,
+                'depth': depth,
+                'nodes': nodes,
+                'seconds': elapsed,
+                'nodes_per_sec': nodes / elapsed if elapsed else None,
+            })
+    return results
+
+
+def bench_search(depths=SEARCH_DEPTHS, repeats=SEARCH_REPEATS):
+    """ Times each search profile at fixed depths from every fixed
+    position, with a fresh transposition table for every search.
+    """
+    results = []
+    for profile_type in (MinimaxAI, HillSearchAI):
+        for name, cells, number in POSITIONS:
+            for depth in depths:
+                times = []
+                for _ in range(repeats):
+                    engine = profile_type(number, None).make_engine()
+                    engine.stats = stats = SearchStats()
+                    start = time.time()
+                    score, move = engine.search(FlatBoard(cells=cells), number, depth)
+                    times.append(time.time() - start)
+                times.sort()
+                results.append({
+                    'profile': profile_type.__name__,
+                    'position': name,
+                    'depth': depth,
+                    'move': move,
+                    'score': score,
+                    'median_ms': times[len(times) // 2] * 1000,
+                    'nodes': stats.generated,
+                    'evaluated': stats.evaluated,
+                    'branching_factor': stats.branching_factor,
+                })
+    return results
+
+
+def bench_games(games=GAMES, seed=SEED):
+    """ Plays headless games between profiles and times them. """
+    random.seed(seed)
+    results = []
+    for p1_type, p2_type, count in games:
+        moves = 0
+        p1_wins = 0
+        start = time.time()
+        for _ in range(count):
+            result = Match(p1_type, p2_type, headless=True).play()
+            moves += len(result.moves)
+            p1_wins += result.winner == 1
+        elapsed = time.time() - start
+        results.append({
+            'player1': p1_type.__name__,
+            'player2': p2_type.__name__,
+            'games': count,
+            'player1_wins': p1_wins,
+            'games_per_sec': count / elapsed,
+            'moves_per_sec': moves / elapsed,
+        })
+    return results
+
+
+def run(filename=FILENAME):
+    """ Runs every benchmark and writes the results to filename. """
+    results = {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'seed': SEED,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'move_generation': bench_move_generation(),
+        'perft': bench_perft(),
+        'search': bench_search(),
+        'games': bench_games(),
+    }
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return results
+
+
+if __name__ == '__main__':
+    filename = sys.argv[1] if len(sys.argv) > 1 else FILENAME
+    run(filename)
+    print "Benchmark results written to %s" % filename
@@ -1,6 +1,7 @@
 """ Module for Mancala Board class. """
 import copy
 from constants import P1_PITS, P1_STORE, P2_PITS, P2_STORE
+from variants import REMAINING_TO_OWNER, Variant
 
 class InvalidBoardArea(Exception):
     """ Exception flagged when moves are attempted on an unknown area. """
@@ -11,9 +12,20 @@ class InvalidMove(Exception):
     pass
 
 class Board(object):
-    """ A Mancala board with size pockets per player and stones """
-
-    def __init__(self, pits=6, stones=4, test_state=None):
+    """ A Mancala board with size pockets per player and stones
+
+    When variant is given it sets pits and stones and the rules played.
+    """
+
+    def __init__(self, pits=6, stones=4, test_state=None, headless=False,
+                 variant=None):
+        if variant is None:
+            variant = Variant(pits, stones)
+        pits = variant.pits
+        stones = variant.stones
+        self.variant = variant
+        # Suppresses move output for batch play.
+        self.headless = headless
         if test_state:
             self.board = test_state
         else:
@@ -25,15 +37,16 @@ class Board(object):
         Note that the order of player 2 pits are displayed in reverse
         from the list index to give the appearance of a loop.
         """
-        return "   %d  %d  %d  %d  %d  %d\n %d                    %d\n   %d  %d  %d  %d  %d  %d\n" % (
+        p2_pits = "".join(["  %d" % stones for stones in reversed(self.board[P2_PITS])])
+        p1_pits = "".join(["  %d" % stones for stones in self.board[P1_PITS]])
+        gap = " " * (len(self.board[P1_PITS]) * 3 + 2)
+        return " %s\n %d%s%d\n %s\n" % (
                        # Player 2 pits in top row
-                       self.board[2][5], self.board[2][4], self.board[2][3],
-                       self.board[2][2], self.board[2][1], self.board[2][0],
+                       p2_pits,
                        # Player 2 & 1 stores in middle row
-                       self.board[3][0], self.board[1][0],
+                       self.board[P2_STORE][0], gap, self.board[P1_STORE][0],
                        # Player 1 pits on bottom row
-                       self.board[0][0], self.board[0][1], self.board[0][2],
-                       self.board[0][3], self.board[0][4], self.board[0][5])
+                       p1_pits)
 
     def _move_stones(self, player_num, start_index):
         """ Moves stones by the Player associated with player_num,
@@ -42,14 +55,15 @@ class Board(object):
         Returns: new state of Board.board, earned_free_move (bool)
 
         player_num: integer from Player.number class
-        start_index: integer specified by player (must be 0-5)
+        start_index: integer specified by player (0 to pits - 1)
         """
         if player_num == 1:
             current_area = P1_PITS
         else:
             current_area = P2_PITS
 
-        print "START_INDEX: " + str(start_index)
+        if not self.headless:
+            print "START_INDEX: " + str(start_index)
 
         # Confirm stones are available at the given index.
         if not self.board[current_area][start_index]:
@@ -83,7 +97,7 @@ class Board(object):
                 index = 0
                 self.board[current_area][index] += 1
 
-        if self._earned_free_move(player_num, current_area, True):
+        if self._earned_free_move(player_num, current_area, not self.headless):
             earned_free_move = True
         else:
             earned_free_move = False
@@ -184,7 +198,8 @@ class Board(object):
             return False
 
         # Check whether opposite pit has capturable stones.
-        elif dummy_board[opposing_area][opposing_index] == 0:
+        elif (dummy_board[opposing_area][opposing_index] == 0 and
+              not self.variant.empty_capture):
             return False
 
         # Placed stone in own empty pit, adjacent capturable stones.
@@ -216,7 +231,8 @@ class Board(object):
             return False
 
         # Check whether opposite pit has capturable stones.
-        elif self.board[opposing_area][opposing_index] == 0:
+        elif (self.board[opposing_area][opposing_index] == 0 and
+              not self.variant.empty_capture):
             return False
 
         # Placed stone in own empty pit, adjacent capturable stones.
@@ -259,7 +275,8 @@ class Board(object):
             last_area, last_index)
 
         captured_stones = self.board[opposing_area][opposing_index]
-        print "%d stones captured!" % captured_stones
+        if not self.headless:
+            print "%d stones captured!" % captured_stones
 
         # Clear the two pits
         self.board[last_area][last_index] = 0
@@ -271,10 +288,25 @@ class Board(object):
 
         return self.board
 
-    def gather_remaining(self, player_num):
+    def finish(self, empty_player_num):
+        """ Allocates the stones left on the board once the pits of
+        empty_player_num are empty, following the variant's rule.
+
+        Returns finished Board.board state."""
+
+        other_num = 2 if empty_player_num == 1 else 1
+        if self.variant.remaining == REMAINING_TO_OWNER:
+            return self.gather_remaining(other_num)
+        else:
+            return self.gather_remaining(other_num, empty_player_num)
+
+    def gather_remaining(self, player_num, destination_num=None):
         """ Gathers stones from remaining_area and deposits
         in the associated player's store. (when game is finished)
 
+        destination_num: player whose store receives the stones, the
+        owner of the pits by default.
+
         Returns finished Board.board state."""
         
         if player_num == 1:
@@ -286,8 +318,13 @@ class Board(object):
         else:
             raise Exception("Unknown player.")
 
+        if destination_num == 1:
+            destination_store = P1_STORE
+        elif destination_num == 2:
+            destination_store = P2_STORE
+
         remaining_stones = 0
-        for i in range(6):
+        for i in range(len(self.board[remaining_area])):
             remaining_stones += self.board[remaining_area][i]
             self.board[remaining_area][i] = 0
 
@@ -314,7 +351,7 @@ class Board(object):
         else:
             raise InvalidBoardArea
 
-        opposing_index = reverse_index(index)
+        opposing_index = reverse_index(index, len(self.board[P1_PITS]))
 
         return opposing_area, opposing_index
 
@@ -0,0 +1,97 @@
+""" Search results kept on disk across games and processes.
+
+The search AIs look a position up here before searching it, and store
+what they found afterwards, so a position searched deeply in one game
+is not searched again in the next. Results live in an SQLite file
+keyed by the searching profile and the position's Zobrist key, and are
+only used when they were searched at least as deep as asked.
+
+The file is opened on first use, in the process using it, so worker
+processes forked from a parent that loaded the cache each get their
+own connection. It is opened in WAL mode, so readers never wait on
+the occasional writer.
+"""
+import os
+import sqlite3
+
+from opening import book_key
+
+FILENAME = "search_cache.db"
+
+# Seconds to wait for another process's write to finish.
+TIMEOUT = 30
+
+# Loaded caches, keyed by filename.
+_LOADED = {}
+
+
+def _signed(key):
+    """ Returns a 64-bit key as the signed integer SQLite stores. """
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class SearchCache(object):
+    """ Root search results by (profile tag, position key). """
+
+    def __init__(self, filename=FILENAME):
+        self.filename = filename
+        self.connection = None
+        # Process the connection was opened in.
+        self.pid = None
+
+    def _connect(self):
+        """ Returns this process's connection, opening it if needed. """
+        if self.connection is None or self.pid != os.getpid():
+            connection = sqlite3.connect(self.filename, timeout=TIMEOUT)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "tag TEXT NOT NULL, key INTEGER NOT NULL, depth INTEGER NOT NULL, "
+                "score REAL NOT NULL, move INTEGER NOT NULL, "
+                "PRIMARY KEY (tag, key))")
+            connection.commit()
+            self.connection = connection
+            self.pid = os.getpid()
+        return self.connection
+
+    def lookup(self, tag, position, number, depth):
+        """ Returns score, move for player number in a FlatBoard searched
+        to depth or deeper, or None when not stored.
+        """
+        row = self._connect().execute(
+            "SELECT score, move FROM results WHERE tag = ? AND key = ? AND depth >= ?",
+            (tag, _signed(book_key(position, number)), depth)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1]
+
+    def store(self, tag, position, number, depth, score, move):
+        """ Stores a search result unless one at least as deep is stored. """
+        connection = self._connect()
+        key = _signed(book_key(position, number))
+        with connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?)",
+                (tag, key, depth, score, move))
+            connection.execute(
+                "UPDATE results SET depth = ?, score = ?, move = ? "
+                "WHERE tag = ? AND key = ? AND depth < ?",
+                (depth, score, move, tag, key, depth))
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        """ Closes this process's connection. """
+        if self.connection is not None and self.pid == os.getpid():
+            self.connection.close()
+        self.connection = None
+
+
+def load(filename=FILENAME):
+    """ Returns the (cached) search cache stored in filename. """
+    cache = _LOADED.get(filename)
+    if cache is None:
+        cache = _LOADED[filename] = SearchCache(filename)
+    return cache
@@ -25,3 +25,38 @@ AI_DEPTH_1 = 6
 AI_DEPTH_2 = 6
 
 HILLCLIMB = 1
+
+# Per-move search time in milliseconds for MinimaxAI. When set, the AI
+# deepens iteratively up to AI_MAX_DEPTH instead of using AI_DEPTH_*.
+AI_TIME_BUDGET = None
+AI_MAX_DEPTH = 30
+
+# Worker processes MinimaxAI splits its root moves across (1 = serial).
+AI_PROCESSES = 1
+
+# MonteCarloAI playouts per move, or milliseconds per move when the
+# time budget is set, and its UCT exploration constant.
+MCTS_PLAYOUTS = 2000
+MCTS_TIME_BUDGET = None
+MCTS_EXPLORATION = 1.4
+
+# Opening book file played from by the search AIs (None to disable).
+OPENING_BOOK = None
+
+# Endgame database file probed by the search AIs (None to disable).
+ENDGAME_DB = None
+
+# SQLite file of search results the search AIs share across games and
+# processes (None to disable).
+SEARCH_CACHE = None
+
+# HeuristicAI evaluation weights, one per evaluation.FEATURES name:
+# store_diff, seeds, free_moves, capture_threats, mobility.
+EVAL_WEIGHTS = (1.0, 0.25, 0.5, 0.25, 0.1)
+
+# NeuralAI evaluation network file, as trained by neural.py.
+NETWORK_FILE = "network.npz"
+
+# Transposition table
+TT_ENTRIES = 2 ** 18 # slots in each AI's table
+TT_REPLACEMENT = 'depth' # 'depth' or 'always'
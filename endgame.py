@@ -0,0 +1,249 @@
+""" Endgame database of exact values for positions with few seeds.
+
+Only the pits matter for how the rest of a game plays out, so a
+position is stored as its pit counts seen from the player to move
+(their pits first). Its value is how many more stones the player to
+move will add to their store than the opponent from here on, with
+perfect play by both sides and end of game gathering by the rules of
+the variant the database was built for.
+
+Positions are numbered by seeds on the board and then by their rank
+among all ways of spreading that many seeds over the pits, so the
+database file is just one signed byte per position behind a header.
+The file is memory-mapped when loaded.
+
+Usage: python endgame.py MAX_SEEDS [FILENAME]
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import mmap
+import struct
+import sys
+from array import array
+
+from flatboard import FlatBoard
+from variants import STANDARD, Variant
+
+MAGIC = 'MEDB'
+# Magic, pits per player, max seeds, variant rule flags.
+HEADER = struct.Struct('<4sBBB')
+FILENAME = "endgame.db"
+
+# Marks positions not solved yet.
+UNKNOWN = -128
+
+# Loaded databases, keyed by filename.
+_LOADED = {}
+
+
+def _binomials(size):
+    """ Returns a table where table[n][k] is n choose k. """
+    table = [[1] + [0] * size for _ in range(size + 1)]
+    for n in range(1, size + 1):
+        for k in range(1, size + 1):
+            table[n][k] = table[n - 1][k - 1] + table[n - 1][k]
+    return table
+
+
+class PositionIndex(object):
+    """ Numbers every spread of up to max_seeds seeds over the pits of
+    both players.
+    """
+
+    def __init__(self, pits, max_seeds):
+        self.pits = pits
+        self.num_cells = pits * 2
+        self.max_seeds = max_seeds
+        self.binomial = _binomials(max_seeds + self.num_cells)
+        cells = self.num_cells
+        # offsets[k] counts the positions with fewer than k seeds.
+        self.offsets = [self.binomial[k + cells - 1][cells] for k in range(max_seeds + 2)]
+        self.size = self.offsets[max_seeds + 1]
+
+    def count(self, seeds, cells):
+        """ Returns the number of ways to spread seeds over cells. """
+        return self.binomial[seeds + cells - 1][cells - 1]
+
+    def index(self, counts):
+        """ Returns the number of a position's pit counts. """
+        binomial = self.binomial
+        remaining = sum(counts)
+        index = self.offsets[remaining]
+        cells = self.num_cells
+        for stones in counts:
+            if not remaining:
+                break
+            # Skip every position with fewer stones in this pit.
+            index += (binomial[remaining + cells - 1][cells - 1] -
+                      binomial[remaining - stones + cells - 1][cells - 1])
+            remaining -= stones
+            cells -= 1
+        return index
+
+    def positions(self, seeds):
+        """ Yields every spread of seeds over the pits, in index order. """
+        counts = [0] * self.num_cells
+
+        def spread(cell, remaining):
+            if cell == self.num_cells - 1:
+                counts[cell] = remaining
+                yield tuple(counts)
+                return
+            for stones in range(remaining + 1):
+                counts[cell] = stones
+                for position in spread(cell + 1, remaining - stones):
+                    yield position
+            counts[cell] = 0
+
+        return spread(0, seeds)
+
+
+class EndgameBuilder(object):
+    """ Solves every position with up to max_seeds seeds on the board.
+
+    Seeds only ever leave the board, so positions are solved in order
+    of seeds. A move that keeps every seed on the board moves seeds
+    towards the mover's store, so play at one seed count never cycles,
+    and those positions are solved depth first.
+    """
+
+    def __init__(self, variant, max_seeds):
+        pits = variant.pits
+        self.index = PositionIndex(pits, max_seeds)
+        self.pits = pits
+        self.variant = variant
+        self.values = array('b', [UNKNOWN]) * self.index.size
+        self.board = FlatBoard(cells=[0] * (pits * 2 + 2), variant=variant)
+
+    def build(self):
+        """ Solves every position and returns the values array. """
+        for seeds in range(self.index.max_seeds + 1):
+            for counts in self.index.positions(seeds):
+                self.solve(counts)
+        return self.values
+
+    def solve(self, counts):
+        """ Returns the value of counts, solving it if needed. """
+        index = self.index.index(counts)
+        value = self.values[index]
+        if value != UNKNOWN:
+            return value
+
+        pits = self.pits
+        own = sum(counts[:pits])
+        other = sum(counts[pits:])
+        if not own or not other:
+            # Game over, the remaining seeds are gathered.
+            value = self._gathered(own, other)
+        else:
+            value = None
+            for gain, sign, child in self._successors(counts):
+                if child is None:
+                    score = gain
+                else:
+                    score = gain + sign * self.solve(child)
+                if value is None or score > value:
+                    value = score
+
+        self.values[index] = value
+        return value
+
+    def _successors(self, counts):
+        """ Returns (gain, sign, child counts) for every move from counts.
+
+        gain is what the move and any end of game gathering add to the
+        mover's lead, and sign is -1 when the opponent moves next in
+        child. child is None once the game is over.
+        """
+        pits = self.pits
+        board = self.board
+        cells = board.cells
+        cells[:pits] = array(cells.typecode, counts[:pits])
+        cells[pits + 1:-1] = array(cells.typecode, counts[pits:])
+        successors = []
+        for move in range(pits):
+            if not counts[move]:
+                continue
+            free_move, undo = board.make_move(1, move)
+            after = cells.tolist()
+            board.unmake_move(undo)
+
+            own = after[:pits]
+            other = after[pits + 1:-1]
+            gain = after[pits]
+            if not any(own) or not any(other):
+                successors.append((gain + self._gathered(sum(own), sum(other)), 1, None))
+            elif free_move:
+                successors.append((gain, 1, tuple(own + other)))
+            else:
+                successors.append((gain, -1, tuple(other + own)))
+        return successors
+
+
+    def _gathered(self, own, other):
+        """ Returns what gathering own and other remaining seeds at the
+        end of the game adds to the mover's lead.
+        """
+        own_score, other_score = self.variant.final_scores(0, own, 0, other)
+        return own_score - other_score
+
+
+class EndgameDatabase(object):
+    """ A memory-mapped endgame database file. """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, pits, max_seeds, flags = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError("Not an endgame database: %s" % filename)
+        self.variant = Variant.from_flags(pits, 0, flags)
+        self.pits = pits
+        self.max_seeds = max_seeds
+        self.index = PositionIndex(pits, max_seeds)
+
+    def probe(self, position, number):
+        """ Returns the value of a FlatBoard for player number to move,
+        or None when it has too many seeds on the board.
+        """
+        if not self.variant.same_rules(position.variant):
+            return None
+        cells = position.cells
+        pits = self.pits
+        if number == 1:
+            counts = cells[:pits].tolist() + cells[pits + 1:-1].tolist()
+        else:
+            counts = cells[pits + 1:-1].tolist() + cells[:pits].tolist()
+        if sum(counts) > self.max_seeds:
+            return None
+        value = ord(self.data[HEADER.size + self.index.index(counts)])
+        return value - 256 if value > 127 else value
+
+
+def build(max_seeds, filename=FILENAME, variant=STANDARD):
+    """ Solves all positions of variant with up to max_seeds seeds and
+    writes the database to filename.
+    """
+    values = EndgameBuilder(variant, max_seeds).build()
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, variant.pits, max_seeds, variant.flags))
+        values.tofile(f)
+
+
+def load(filename=FILENAME):
+    """ Returns the (cached) database stored in filename. """
+    database = _LOADED.get(filename)
+    if database is None:
+        database = _LOADED[filename] = EndgameDatabase(filename)
+    return database
+
+
+if __name__ == '__main__':
+    max_seeds = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        build(max_seeds, sys.argv[2])
+    else:
+        build(max_seeds)
@@ -0,0 +1,169 @@
+""" Feature-based evaluation kept up to date move by move.
+
+EvalBoard is a FlatBoard that also keeps the features below, each as
+player 1's count minus player 2's, up to date through make_move and
+unmake_move. A move only changes the pits it sows into (and the pits
+facing them), so only those are rescored, and scoring a leaf is a
+weighted sum of the kept features.
+
+    store_diff       stones in the stores
+    seeds            stones in the pits
+    free_moves       pits holding exactly enough to end in the store
+    capture_threats  empty pits facing stones, where a last stone captures
+    mobility         pits that can be moved from
+
+Evaluator turns the features into a score for the searching player.
+Finished games are scored exactly, like endgame database results.
+"""
+from flatboard import FlatBoard
+from search import solved_score
+
+FEATURES = ('store_diff', 'seeds', 'free_moves', 'capture_threats', 'mobility')
+
+# Per slot tables, keyed by pit count.
+_TABLES = {}
+
+
+def _build_tables(board):
+    """ Returns the evaluation tables for board's pit count. """
+    pits = board.num_pits
+    size = board.size
+    # sign[slot] is 1 for player 1 pits, -1 for player 2 pits, 0 for stores.
+    sign = [0] * size
+    # free_count[slot] is the stones that end a move from slot in the store.
+    free_count = [0] * size
+    for number, direction in ((1, 1), (2, -1)):
+        for index in range(pits):
+            slot = board.offsets[number] + index
+            sign[slot] = direction
+            free_count[slot] = pits - index
+
+    # touched[number][index][stones] is every pit whose features a move
+    # of stones (up to a full lap) from index can change.
+    touched = [None, [], []]
+    for number in (1, 2):
+        for index in range(pits):
+            start = board.offsets[number] + index
+            cycle = board.sow[number][index]
+            by_stones = []
+            for stones in range(len(cycle) + 1):
+                slots = set([start])
+                slots.update(cycle[:stones])
+                slots.update([board.opposite[slot] for slot in list(slots)
+                              if board.opposite[slot] is not None])
+                by_stones.append(tuple(sorted(slot for slot in slots if sign[slot])))
+            touched[number].append(by_stones)
+
+    return {'sign': tuple(sign), 'free_count': tuple(free_count),
+            'touched': touched, 'pit_slots': touched[1][0][-1]}
+
+
+def get_tables(board):
+    """ Returns the (cached) evaluation tables for board's pit count. """
+    tables = _TABLES.get(board.num_pits)
+    if tables is None:
+        tables = _TABLES[board.num_pits] = _build_tables(board)
+    return tables
+
+
+class EvalBoard(FlatBoard):
+    """ A FlatBoard keeping its evaluation features.
+
+    features is (player 1 seeds, player 2 seeds, free_moves,
+    capture_threats, mobility), the last three as player 1 minus
+    player 2. Moves must be unmade in the reverse order they were made.
+    """
+
+    def __init__(self, pits=6, stones=4, cells=None, variant=None):
+        super(EvalBoard, self).__init__(pits, stones, cells, variant)
+        tables = get_tables(self)
+        self.sign = tables['sign']
+        self.free_count = tables['free_count']
+        self.touched = tables['touched']
+        self.features = self._local(tables['pit_slots'])
+        # Features from before each move not yet unmade.
+        self.history = []
+
+    def _local(self, slots):
+        """ Returns the features counted over slots only. """
+        cells = self.cells
+        sign = self.sign
+        free_count = self.free_count
+        opposite = self.opposite
+        seeds1 = seeds2 = free = threats = mobility = 0
+        for slot in slots:
+            stones = cells[slot]
+            direction = sign[slot]
+            if stones:
+                if direction > 0:
+                    seeds1 += stones
+                else:
+                    seeds2 += stones
+                mobility += direction
+                if stones == free_count[slot]:
+                    free += direction
+            elif cells[opposite[slot]]:
+                threats += direction
+        return (seeds1, seeds2, free, threats, mobility)
+
+    def make_move(self, number, start_index):
+        """ FlatBoard.make_move, also updating features. """
+        cells = self.cells
+        stones = cells[self.offsets[number] + start_index]
+        by_stones = self.touched[number][start_index]
+        slots = by_stones[min(stones, len(by_stones) - 1)]
+        before = self._local(slots)
+        free_move, undo = FlatBoard.make_move(self, number, start_index)
+        after = self._local(slots)
+        features = self.features
+        self.history.append(features)
+        self.features = (features[0] + after[0] - before[0],
+                         features[1] + after[1] - before[1],
+                         features[2] + after[2] - before[2],
+                         features[3] + after[3] - before[3],
+                         features[4] + after[4] - before[4])
+        return free_move, undo
+
+    def unmake_move(self, undo):
+        """ FlatBoard.unmake_move, also restoring features. """
+        FlatBoard.unmake_move(self, undo)
+        self.features = self.history.pop()
+
+    def side_empty(self, number):
+        """ Returns whether all pits of player number are empty. """
+        return not self.features[number - 1]
+
+
+class Evaluator(object):
+    """ Scores EvalBoards for player number with weights, a value per
+    name in FEATURES.
+
+    Called as evaluate(position, is_max) like the AI profiles' own
+    evaluations, but the score is always from number's point of view,
+    as minimax expects of its leaves.
+    """
+
+    def __init__(self, number, weights):
+        self.number = number
+        self.weights = tuple(weights)
+        if len(self.weights) != len(FEATURES):
+            raise ValueError("Expected %d weights, got %d" %
+                             (len(FEATURES), len(self.weights)))
+
+    def __call__(self, position, is_max):
+        features = position.features
+        seeds1 = features[0]
+        seeds2 = features[1]
+        cells = position.cells
+        store1 = cells[position.stores[1]]
+        store2 = cells[position.stores[2]]
+        if not seeds1 or not seeds2:
+            scores = position.variant.final_scores(store1, seeds1, store2, seeds2)
+            lead = scores[0] - scores[1]
+            return solved_score(lead if self.number == 1 else -lead)
+
+        weights = self.weights
+        score = (weights[0] * (store1 - store2) + weights[1] * (seeds1 - seeds2) +
+                 weights[2] * features[2] + weights[3] * features[3] +
+                 weights[4] * features[4])
+        return score if self.number == 1 else -score
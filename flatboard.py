@@ -0,0 +1,194 @@
+""" Module for the compact Mancala board used by the search engines.
+
+The whole board lives in one flat array. With the default six pits:
+
+    slots 0-5   Player 1 pits
+    slot  6     Player 1 store
+    slots 7-12  Player 2 pits
+    slot  13    Player 2 store
+
+Sowing follows the variant's precomputed slot tables, so a move is a handful of
+array increments, and unmake_move undoes it in place without copying.
+Once set_zobrist is called the board also keeps its Zobrist hash in
+key, updated incrementally by every move.
+"""
+from array import array
+
+from board import InvalidMove
+from constants import P1_PITS, P1_STORE, P2_PITS, P2_STORE
+from variants import STANDARD, Variant
+
+class FlatBoard(object):
+    """ A Mancala board stored as a single flat array of slots.
+
+    When variant is given it sets pits and stones and the rules played.
+    """
+
+    def __init__(self, pits=6, stones=4, cells=None, variant=None):
+        if variant is None:
+            if pits == STANDARD.pits and stones == STANDARD.stones:
+                variant = STANDARD
+            else:
+                variant = Variant(pits, stones)
+        pits = variant.pits
+        stones = variant.stones
+        tables = variant.tables
+        self.variant = variant
+        self.empty_capture = variant.empty_capture
+        self.num_pits = pits
+        self.size = tables['size']
+        self.stores = tables['stores']
+        self.offsets = tables['offsets']
+        self.sow = tables['sow']
+        self.opposite = tables['opposite']
+        self.owner = tables['owner']
+        if cells is None:
+            cells = ([stones] * pits + [0]) * 2
+        total = sum(cells)
+        self.cells = array('B' if total < 256 else 'H', cells)
+        self.zobrist = None
+        self.key = 0
+
+    @classmethod
+    def from_board(cls, board, variant=None):
+        """ Returns a FlatBoard for a nested Board.board state. """
+        return cls(len(board[P1_PITS]),
+                   cells=list(board[P1_PITS]) + list(board[P1_STORE]) +
+                   list(board[P2_PITS]) + list(board[P2_STORE]),
+                   variant=variant)
+
+    def to_board(self):
+        """ Returns the position as a nested Board.board state. """
+        cells = self.cells.tolist()
+        pits = self.num_pits
+        return [cells[:pits], [cells[pits]],
+                cells[pits + 1:-1], [cells[-1]]]
+
+    def copy(self):
+        """ Returns an independent copy of this board. """
+        board = self.__class__(cells=self.cells, variant=self.variant)
+        if self.zobrist is not None:
+            board.zobrist = self.zobrist
+            board.key = self.key
+        return board
+
+    def set_zobrist(self, zobrist):
+        """ Starts maintaining the Zobrist hash of this board in key. """
+        self.zobrist = zobrist
+        self.key = zobrist.hash_cells(self.cells)
+
+    def pits(self, number):
+        """ Returns the pit counts of player number as a list. """
+        offset = self.offsets[number]
+        return self.cells[offset:offset + self.num_pits].tolist()
+
+    def store(self, number):
+        """ Returns the store count of player number. """
+        return self.cells[self.stores[number]]
+
+    def side_empty(self, number):
+        """ Returns whether all pits of player number are empty. """
+        offset = self.offsets[number]
+        return not any(self.cells[offset:offset + self.num_pits])
+
+    def game_over(self):
+        """ Returns whether either player's pits are empty. """
+        return self.side_empty(1) or self.side_empty(2)
+
+    def final_scores(self):
+        """ Returns the final (player 1, player 2) scores of a finished
+        game, with remaining stones allocated by the variant.
+        """
+        cells = self.cells
+        pits = self.num_pits
+        return self.variant.final_scores(cells[pits], sum(cells[:pits]),
+                                         cells[-1], sum(cells[pits + 1:-1]))
+
+    def eligible_moves(self, number):
+        """ Returns the pit indexes player number can move from. """
+        offset = self.offsets[number]
+        cells = self.cells
+        return [i for i in range(self.num_pits) if cells[offset + i]]
+
+    def make_move(self, number, start_index):
+        """ Moves stones for player number from start_index in place.
+
+        Returns: earned_free_move (bool), undo information for
+        unmake_move. undo[3] is the number of stones captured from the
+        opposite pit, or None without a capture.
+        """
+        cells = self.cells
+        start = self.offsets[number] + start_index
+        stones = cells[start]
+        if not stones:
+            raise InvalidMove
+        cells[start] = 0
+
+        cycle = self.sow[number][start_index]
+        laps, remainder = divmod(stones, len(cycle))
+        old_key = key = self.key
+        if self.zobrist is None:
+            keys = None
+            if laps:
+                for slot in cycle:
+                    cells[slot] += laps
+            for slot in cycle[:remainder]:
+                cells[slot] += 1
+        else:
+            # Hash out the touched slots before sowing and back in after.
+            keys = self.zobrist.keys
+            touched = cycle if laps else cycle[:remainder]
+            key ^= keys[start][stones]
+            for slot in touched:
+                key ^= keys[slot][cells[slot]]
+            if laps:
+                for slot in cycle:
+                    cells[slot] += laps
+            for slot in cycle[:remainder]:
+                cells[slot] += 1
+            for slot in touched:
+                key ^= keys[slot][cells[slot]]
+
+        last = cycle[stones % len(cycle) - 1]
+        store = self.stores[number]
+        if last == store:
+            self.key = key
+            return True, (number, start_index, stones, None, old_key)
+
+        # Last stone in an empty pit of our own captures the opposite pit.
+        captured = None
+        if self.owner[last] == number and cells[last] == 1:
+            opposite = self.opposite[last]
+            if cells[opposite] or self.empty_capture:
+                captured = cells[opposite]
+                if keys is not None:
+                    key ^= (keys[last][1] ^ keys[opposite][captured] ^
+                            keys[store][cells[store]] ^
+                            keys[store][cells[store] + captured + 1])
+                cells[last] = 0
+                cells[opposite] = 0
+                cells[store] += captured + 1
+
+        self.key = key
+        return False, (number, start_index, stones, captured, old_key)
+
+    def unmake_move(self, undo):
+        """ Restores the position from before make_move returned undo. """
+        number, start_index, stones, captured, key = undo
+        cells = self.cells
+        cycle = self.sow[number][start_index]
+
+        if captured is not None:
+            last = cycle[stones % len(cycle) - 1]
+            cells[last] = 1
+            cells[self.opposite[last]] = captured
+            cells[self.stores[number]] -= captured + 1
+
+        laps, remainder = divmod(stones, len(cycle))
+        if laps:
+            for slot in cycle:
+                cells[slot] -= laps
+        for slot in cycle[:remainder]:
+            cells[slot] -= 1
+        cells[self.offsets[number] + start_index] = stones
+        self.key = key
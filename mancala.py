@@ -18,48 +18,102 @@ class Player(object):
         """ Returns player name. """
         return self.name
 
+    def close(self):
+        """ Releases anything the player holds once its match is over. """
+        pass
+
+class GameResult(object):
+    """ The outcome of a finished match. """
+
+    def __init__(self, scores, num_turns, moves):
+        # Final (player 1, player 2) store counts.
+        self.scores = scores
+        self.num_turns = num_turns
+        # (player number, pit index, earned free move) for every move.
+        self.moves = moves
+
+    @property
+    def winner(self):
+        """ Returns the winning player number, or 0 for a draw. """
+        if self.scores[0] > self.scores[1]:
+            return 1
+        elif self.scores[1] > self.scores[0]:
+            return 2
+        else:
+            return 0
+
 class Match(object):
     """ A match of Mancala has two Players and a Board.
 
-    Match tracks current turn.
+    Match tracks current turn. A headless match prints nothing and its
+    AI players skip their thinking delay.
 
     """
 
-    def __init__(self, player1_type=Player, player2_type=Player):
-        """ Initializes a new match. """
-        self.board = Board()
+    def __init__(self, player1_type=Player, player2_type=Player, headless=False,
+                 variant=None):
+        """ Initializes a new match, of the standard game by default. """
+        self.headless = headless
+        self.board = Board(headless=headless, variant=variant)
         self.players = [player1_type(1, self.board), player2_type(2, self.board)]
         self.player1 = self.players[0]
         self.player2 = self.players[1]
         self.current_turn = self.player1
 
     def handle_next_move(self, count):
-        """ Shows board and handles next move. """
-        print self.board.textify_board()
+        """ Plays the match to the end.
+
+        Returns: final (player 1 store, player 2 store), move count.
+        """
+        result = self.play(count)
+        return self._get_winner(), result.num_turns
 
-        next_move = self.current_turn.get_next_move()
+    def play(self, count=0):
+        """ Shows board and handles moves until the match is won.
+
+        Returns: GameResult of the match.
+        """
         try:
-            self.board.board, free_move_earned = self.board._move_stones(self.current_turn.number, next_move)
-        except InvalidMove:
-            # Check whether game was won by AI.
+            return self._play(count)
+        finally:
+            self.close()
+
+    def _play(self, count):
+        moves = []
+        while True:
+            if not self.headless:
+                print self.board.textify_board()
+
+            number = self.current_turn.number
+            next_move = self.current_turn.get_next_move()
+            try:
+                self.board.board, free_move_earned = self.board._move_stones(number, next_move)
+            except InvalidMove:
+                # Check whether game was won by AI.
+                if self._check_for_winner():
+                    break
+                if self.current_turn.__class__ == HumanPlayer and not self.headless:
+                    print "Please select a move with stones you can move."
+                continue
+
+            moves.append((number, next_move, free_move_earned))
+
+            # Check whether game was won.
             if self._check_for_winner():
-                winner = self._get_winner()
-                return winner, count
-            if self.current_turn.__class__ == HumanPlayer:
-                print "Please select a move with stones you can move."
-            return self.handle_next_move(count)
-
-        # Check whether game was won.
-        if self._check_for_winner():
-            winner = self._get_winner()
-            return winner, count
-
-        # Check whether free move was earned
-        if free_move_earned:
-            return self.handle_next_move(count+1)
-        else:
-            self._swap_current_turn()
-            return self.handle_next_move(count+1)
+                break
+
+            count += 1
+            # Check whether free move was earned
+            if not free_move_earned:
+                self._swap_current_turn()
+
+        return GameResult(self.board.get_scores(), count, moves)
+
+
+    def close(self):
+        """ Closes both players, shutting down any worker processes. """
+        for player in self.players:
+            player.close()
 
 
     def _get_winner(self):
@@ -80,12 +134,14 @@ class Match(object):
     def _check_for_winner(self):
         """ Checks for winner. Announces the win."""
         if set(self.board.board[P1_PITS]) == set([0]):
-            self.board.board = self.board.gather_remaining(self.player2.number)
-            print "Player 1 finished! %s: %d to %s: %d" % (self.player1.name, self.board.board[P1_STORE][0], self.player2.name, self.board.board[P2_STORE][0])
+            self.board.board = self.board.finish(self.player1.number)
+            if not self.headless:
+                print "Player 1 finished! %s: %d to %s: %d" % (self.player1.name, self.board.board[P1_STORE][0], self.player2.name, self.board.board[P2_STORE][0])
             return True
         elif set(self.board.board[P2_PITS]) == set([0]):
-            self.board.board = self.board.gather_remaining(self.player1.number)
-            print "Player 2 finished! %s: %d to %s: %d" % (self.player1.name, self.board.board[P1_STORE][0], self.player2.name, self.board.board[P2_STORE][0])
+            self.board.board = self.board.finish(self.player2.number)
+            if not self.headless:
+                print "Player 2 finished! %s: %d to %s: %d" % (self.player1.name, self.board.board[P1_STORE][0], self.player2.name, self.board.board[P2_STORE][0])
             return True
         else:
             return False
@@ -106,11 +162,11 @@ class HumanPlayer(Player):
 
     def get_next_move(self):
         """ Gets next move from a human player. """
-        value = input("Please input your next move (1 to 6): ")
+        value = input("Please input your next move (1 to %d): " % self.board.variant.pits)
         return value - 1
 
-def reverse_index(index):
+def reverse_index(index, pits=6):
     """ Returns the mirror index to the one given. """
-    rev_index = range(0, 6)
+    rev_index = range(0, pits)
     rev_index.reverse()
     return rev_index[index]
@@ -0,0 +1,176 @@
+""" Module for Monte Carlo tree search over FlatBoards.
+
+Each iteration walks down the tree by UCT, expands one new move, plays
+the game out with random moves and credits the result back up the
+path. The tree is kept between calls, so after the opponent replies
+the search carries on from the matching subtree.
+"""
+import math
+import random
+import time
+
+from search import SearchStats, flip_number
+from transposition import get_zobrist
+
+# Tree levels searched for the current position when reusing a tree.
+REUSE_DEPTH = 4
+
+
+class MCTSNode(object):
+    """ A position in the search tree.
+
+    wins is counted for the player who moved into this node, so the
+    parent can compare its children directly.
+    """
+
+    __slots__ = ('move', 'number', 'parent', 'children', 'untried',
+                 'visits', 'wins', 'key')
+
+    def __init__(self, move, number, parent, untried, key):
+        self.move = move
+        # Player to move in this position.
+        self.number = number
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        self.key = key
+
+    def select_child(self, exploration):
+        """ Returns the child with the best UCT score. """
+        log_visits = math.log(self.visits)
+        best = None
+        best_score = None
+        for child in self.children:
+            score = (child.wins / child.visits +
+                     exploration * math.sqrt(log_visits / child.visits))
+            if best is None or score > best_score:
+                best = child
+                best_score = score
+        return best
+
+
+def rollout(position, number):
+    """ Plays position out with uniformly random moves.
+
+    Returns: final (player 1, player 2) scores.
+    """
+    while not position.game_over():
+        free_move, undo = position.make_move(number, random.choice(position.eligible_moves(number)))
+        if not free_move:
+            number = flip_number(number)
+    return position.final_scores()
+
+
+def reward(scores, number):
+    """ Returns 1 for a win by player number, 0.5 for a draw, else 0. """
+    if scores[0] == scores[1]:
+        return 0.5
+    elif (scores[0] > scores[1]) == (number == 1):
+        return 1.0
+    else:
+        return 0.0
+
+
+class MonteCarloSearch(object):
+    """ UCT search keeping its tree between moves. """
+
+    def __init__(self, exploration):
+        self.exploration = exploration
+        self.root = None
+        # Counters, added to by every search until replaced. Expanded
+        # nodes count as generated and playouts as evaluated.
+        self.stats = SearchStats()
+
+    def _node(self, position, move, number, parent):
+        """ Returns a new node for position with player number to move. """
+        if position.side_empty(1) or position.side_empty(2):
+            untried = []
+        else:
+            untried = position.eligible_moves(number)
+            random.shuffle(untried)
+        return MCTSNode(move, number, parent, untried,
+                        position.key ^ position.zobrist.side[number])
+
+    def _find_root(self, key):
+        """ Returns the node of the old tree matching key, or None. """
+        level = [self.root] if self.root is not None else []
+        for _ in range(REUSE_DEPTH + 1):
+            next_level = []
+            for node in level:
+                if node.key == key:
+                    return node
+                next_level.extend(node.children)
+            level = next_level
+        return None
+
+    def choose_move(self, position, number, playouts, time_budget=None):
+        """ Searches position for player number and returns a move.
+
+        Stops after playouts iterations, or after time_budget
+        milliseconds when that is given.
+        """
+        position = position.copy()
+        if position.zobrist is None:
+            position.set_zobrist(get_zobrist(position.size, sum(position.cells)))
+
+        root = self._find_root(position.key ^ position.zobrist.side[number])
+        if root is None:
+            root = self._node(position, None, number, None)
+        root.parent = None
+        self.root = root
+
+        deadline = time.time() + time_budget / 1000.0 if time_budget else None
+        iterations = 0
+        while True:
+            if deadline is None:
+                if iterations >= playouts:
+                    break
+            elif time.time() >= deadline:
+                break
+            self._iterate(position.copy())
+            iterations += 1
+
+        if not root.children:
+            return random.choice(position.eligible_moves(number))
+        best = max(root.children, key=lambda child: child.visits)
+        return best.move
+
+    def _iterate(self, position):
+        """ Runs one selection, expansion, playout and update. """
+        node = self.root
+        stats = self.stats
+        ply = 0
+
+        # Select
+        while not node.untried and node.children:
+            child = node.select_child(self.exploration)
+            position.make_move(node.number, child.move)
+            node = child
+            ply += 1
+
+        # Expand
+        if node.untried:
+            move = node.untried.pop()
+            free_move, undo = position.make_move(node.number, move)
+            number = node.number if free_move else flip_number(node.number)
+            child = self._node(position, move, number, node)
+            node.children.append(child)
+            node = child
+            ply += 1
+            stats.generated += 1
+        if ply > stats.max_depth:
+            stats.max_depth = ply
+
+        # Playout, without keeping the hash up to date.
+        position.zobrist = None
+        scores = rollout(position, node.number)
+        stats.evaluated += 1
+
+        # Update
+        while node is not None:
+            node.visits += 1
+            if node.parent is not None:
+                node.wins += reward(scores, node.parent.number)
+            node = node.parent
@@ -0,0 +1,202 @@
+""" Move service for the match server: AI moves searched in a process
+pool, with identical requests shared.
+
+Requests for the same position, profile and seat that arrive while
+that position is being searched wait for the one search instead of
+starting their own, as long as that search may run at least until
+their own deadline, and finished searches are kept in a bounded LRU
+cache keyed by the position's Zobrist key, so games following the
+same lines (openings most of all) cost one search between them. Only
+searches given their whole time budget are cached: a request that
+waited for a worker may search just a ply or two, and its move should
+not answer every later request for the position.
+
+Only profiles that search (those with make_engine) are shared and
+cached; random and Monte Carlo moves are chosen afresh every time.
+
+Results are passed back by dispatch, which the caller runs in its own
+thread (the server's event loop), never in the pool's.
+"""
+import multiprocessing
+import Queue
+import random
+import time
+import traceback
+from collections import OrderedDict
+
+from board import Board
+from flatboard import FlatBoard
+from opening import book_key
+
+# Finished searches kept by a service.
+CACHE_SIZE = 10000
+
+# AI players of a worker process, keyed by (profile type, number).
+_players = {}
+
+
+def _init_worker():
+    """ Pool initializer giving each worker its own random sequence. """
+    random.seed()
+
+
+def _ai_move(task):
+    """ Worker entry point. Returns the move an AI profile chooses,
+    the depth it completed and whether it had its whole time budget, as
+    _search_move does. The move is None when the move's deadline passed
+    while it waited for a worker or the search failed.
+    """
+    try:
+        return _search_move(task)
+    except Exception:
+        # The pool would drop the callback, leaving the request waiting
+        # forever; report the failure as a missed deadline instead.
+        traceback.print_exc()
+        return None, 0, False
+
+
+def _search_move(task):
+    """ Returns (move, depth completed, full budget) for a task of
+    _ai_move, full budget telling whether the search had all of budget.
+
+    budget and grace are in milliseconds; the search stops grace
+    before the deadline to leave time for passing the move back.
+    """
+    profile_type, number, variant, cells, deadline, budget, grace = task
+    remaining = (deadline - time.time()) * 1000 - grace
+    if remaining <= 0:
+        return None, 0, False
+    player = _players.get((profile_type, number))
+    if player is None:
+        player = _players[(profile_type, number)] = profile_type(number, None)
+    # Searching profiles deepen within the time left instead of
+    # searching to their fixed depth.
+    full_budget = True
+    if hasattr(player, 'time_budget'):
+        player.time_budget = min(budget, remaining)
+        full_budget = remaining >= budget
+    position = FlatBoard(cells=cells, variant=variant)
+    player.board = Board(test_state=position.to_board(), headless=True,
+                         variant=variant)
+    del player.move_stats[:]
+    move = player.get_next_move()
+    depth = player.move_stats[-1].depth if player.move_stats else 0
+    return move, depth, full_budget
+
+
+class MoveService(object):
+    """ Searches AI moves in a process pool, sharing identical requests.
+
+    metrics counts:
+        requests    moves asked for
+        hits        moves answered from the cache
+        misses      searches started for cacheable moves
+        coalesced   requests that joined a search already running
+        uncached    searches started for moves that are never cached
+        evictions   cached moves dropped to stay within capacity
+        dropped     searches that missed their deadline or failed
+        shallow     moves not cached as their search was cut short
+    """
+
+    def __init__(self, processes=None, capacity=CACHE_SIZE):
+        self.pool = multiprocessing.Pool(processes, _init_worker)
+        self.capacity = capacity
+        # (move, depth completed) by request key, least recently used
+        # first.
+        self.cache = OrderedDict()
+        # (search deadline, [(deadline, callback)...]) of the latest
+        # running search for each request key.
+        self.pending = {}
+        # (key, waiting, _ai_move result) of searches finished in the
+        # pool, waiting as in pending.
+        self.completed = Queue.Queue()
+        self.metrics = dict.fromkeys(('requests', 'hits', 'misses', 'coalesced',
+                                      'uncached', 'evictions', 'dropped',
+                                      'shallow'), 0)
+
+    def _key(self, profile_type, number, position):
+        """ Returns the request key for position, or None when moves of
+        profile_type are never shared.
+        """
+        if not hasattr(profile_type, 'make_engine'):
+            return None
+        variant = position.variant
+        return (profile_type, number, variant.pits, variant.flags,
+                book_key(position.copy(), number))
+
+    def request(self, profile_type, number, position, deadline, budget, grace,
+                callback):
+        """ Asks for the move of profile_type playing number in a
+        FlatBoard. callback(move) is called from a later dispatch; move
+        is None if no search finished by deadline (a time.time() value).
+        """
+        metrics = self.metrics
+        metrics['requests'] += 1
+        key = self._key(profile_type, number, position)
+        waiting = [(deadline, callback)]
+        if key is None:
+            metrics['uncached'] += 1
+        else:
+            entry = self.cache.get(key)
+            if entry is not None:
+                metrics['hits'] += 1
+                del self.cache[key]
+                self.cache[key] = entry
+                self.completed.put((None, waiting, entry + (True,)))
+                return
+            running = self.pending.get(key)
+            # A search giving up before this request's deadline would
+            # cost it time it still has, so a later deadline searches
+            # afresh.
+            if running is not None and running[0] >= deadline:
+                metrics['coalesced'] += 1
+                running[1].append((deadline, callback))
+                return
+            metrics['misses'] += 1
+            self.pending[key] = (deadline, waiting)
+
+        task = (profile_type, number, position.variant, position.cells.tolist(),
+                deadline, budget, grace)
+
+        def done(result):
+            self.completed.put((key, waiting, result))
+
+        self.pool.apply_async(_ai_move, (task,), callback=done)
+
+    def dispatch(self):
+        """ Passes every finished move to the callbacks waiting on it. """
+        while True:
+            try:
+                key, waiting, (move, depth, full_budget) = self.completed.get_nowait()
+            except Queue.Empty:
+                return
+            if key is not None:
+                running = self.pending.get(key)
+                if running is not None and running[1] is waiting:
+                    del self.pending[key]
+                if move is not None:
+                    if full_budget:
+                        self._store(key, move, depth)
+                    else:
+                        self.metrics['shallow'] += 1
+            if move is None:
+                self.metrics['dropped'] += 1
+            for deadline, callback in waiting:
+                callback(move)
+
+    def _store(self, key, move, depth):
+        """ Caches move searched to depth, unless a deeper search of key
+        is cached, dropping the least recently used beyond capacity.
+        """
+        entry = self.cache.pop(key, None)
+        if entry is not None and entry[1] > depth:
+            move, depth = entry
+        self.cache[key] = (move, depth)
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+            self.metrics['evictions'] += 1
+
+    def close(self):
+        """ Shuts down the worker processes. """
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,328 @@
+""" Learned position evaluation: a small NumPy multilayer perceptron.
+
+The network reads a position's cells from the point of view of the
+player to move (their pits and store first), scaled by the stones in
+play, and outputs through tanh the expected result of the game for
+that player, from -1 (loss) to 1 (win). Hidden layers use ReLU.
+
+NetworkEvaluator scores positions for a searching player like
+evaluation.Evaluator, and also provides evaluate_batch, which
+AlphaBetaSearch uses to score all the leaf children of a node in one
+forward pass. Finished games are scored exactly.
+
+Networks are trained on the self-play shards of selfplay.py and saved
+as .npz files holding each layer's weights and biases and the variant
+they were trained for. Everything runs on the CPU with NumPy alone.
+
+Usage: python neural.py DIRECTORY [-o FILENAME] [-H HIDDEN [HIDDEN ...]]
+                        [-e EPOCHS] [-b BATCH_SIZE] [-l LEARNING_RATE]
+trains a network on the shards in DIRECTORY.
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import argparse
+import glob
+import hashlib
+import os
+
+import numpy as np
+
+from search import flip_number, solved_score
+from variants import STANDARD, Variant
+
+FILENAME = "network.npz"
+SEED = 1
+
+# Heuristic score of a certain win, kept below solved_score's so that
+# known results outrank the network's guesses.
+VALUE_SCALE = 50.0
+
+# Training: hidden layer sizes, passes over the data, positions per
+# update, Adam step size and the share of positions held out.
+HIDDEN = (32, 32)
+EPOCHS = 20
+BATCH_SIZE = 256
+LEARNING_RATE = 0.001
+VALIDATION = 0.1
+
+# Loaded networks, keyed by filename.
+_LOADED = {}
+
+
+class Network(object):
+    """ A multilayer perceptron over the cells of one variant.
+
+    layers: (weights, biases) pairs, weights shaped (inputs, outputs);
+        the last layer has a single output
+    """
+
+    def __init__(self, layers, variant=STANDARD):
+        self.layers = [(np.asarray(weights, dtype=np.float32),
+                        np.asarray(biases, dtype=np.float32))
+                       for weights, biases in layers]
+        self.variant = variant
+        pits = variant.pits
+        size = pits * 2 + 2
+        self.scale = 1.0 / (size - 2) / variant.stones
+        # Cell order seen by each player to move.
+        self.orders = np.array([range(size), range(size),
+                                range(pits + 1, size) + range(pits + 1)])
+
+    @classmethod
+    def random(cls, hidden=HIDDEN, variant=STANDARD, seed=SEED):
+        """ Returns an untrained network with He initialized weights. """
+        rng = np.random.RandomState(seed)
+        sizes = [variant.pits * 2 + 2] + list(hidden) + [1]
+        layers = [(rng.randn(inputs, outputs) * np.sqrt(2.0 / inputs),
+                   np.zeros(outputs))
+                  for inputs, outputs in zip(sizes[:-1], sizes[1:])]
+        return cls(layers, variant)
+
+    def inputs(self, cells, movers):
+        """ Returns the network inputs for an (N, size) array of cells
+        with the players to move in movers.
+        """
+        rows = np.arange(len(cells))[:, None]
+        return (cells[rows, self.orders[movers]] * self.scale).astype(np.float32)
+
+    def forward(self, inputs):
+        """ Returns the activations of every layer, inputs first. """
+        activations = [inputs]
+        last = len(self.layers) - 1
+        for index, (weights, biases) in enumerate(self.layers):
+            outputs = np.dot(activations[-1], weights) + biases
+            if index == last:
+                activations.append(np.tanh(outputs[:, 0]))
+            else:
+                activations.append(np.maximum(outputs, 0))
+        return activations
+
+    def values(self, cells, movers):
+        """ Returns the expected results for the players to move. """
+        return self.forward(self.inputs(cells, movers))[-1]
+
+    def digest(self):
+        """ Returns a short hash of the variant and weights, telling
+        networks that score differently apart.
+        """
+        digest = hashlib.sha1("%d/%d/%d" % (self.variant.pits, self.variant.stones,
+                                            self.variant.flags))
+        for weights, biases in self.layers:
+            digest.update(weights.tobytes())
+            digest.update(biases.tobytes())
+        return digest.hexdigest()[:16]
+
+    def save(self, filename=FILENAME):
+        """ Writes the network to an .npz file. """
+        arrays = {'variant': np.array([self.variant.pits, self.variant.stones,
+                                       self.variant.flags])}
+        for index, (weights, biases) in enumerate(self.layers):
+            arrays['weights%d' % index] = weights
+            arrays['biases%d' % index] = biases
+        with open(filename, 'wb') as f:
+            np.savez(f, **arrays)
+
+
+def load(filename=FILENAME):
+    """ Returns the (cached) network stored in filename. """
+    network = _LOADED.get(filename)
+    if network is None:
+        with np.load(filename) as arrays:
+            pits, stones, flags = arrays['variant'].tolist()
+            layers = []
+            while 'weights%d' % len(layers) in arrays.files:
+                index = len(layers)
+                layers.append((arrays['weights%d' % index], arrays['biases%d' % index]))
+        network = _LOADED[filename] = Network(layers, Variant.from_flags(pits, stones, flags))
+    return network
+
+
+def _product(rows, weights):
+    """ Returns the matrix product of rows and weights, summed in an
+    order that does not depend on the number of rows. BLAS kernels
+    change their order with the row count, which would score a
+    position differently alone and in a batch.
+    """
+    return (rows[:, :, None] * weights).sum(1)
+
+
+class NetworkEvaluator(object):
+    """ Scores positions for player number with a Network.
+
+    Called as evaluate(position, is_max) like evaluation.Evaluator, the
+    score always from number's point of view. is_max tells whose move
+    it is: number's when set, the opponent's otherwise.
+    """
+
+    def __init__(self, number, network):
+        self.number = number
+        self.network = network
+        self.variant = network.variant
+        pits = self.variant.pits
+        size = pits * 2 + 2
+        self.sides = (slice(0, pits), slice(pits + 1, size - 1))
+        # First layer weights for raw cells, with the scaling and the
+        # reordering for the player to move folded in: number to move
+        # in the first half of the columns, the opponent in the second.
+        weights, self.first_biases = network.layers[0]
+        first = []
+        for mover in (number, flip_number(number)):
+            unordered = np.empty_like(weights)
+            unordered[network.orders[mover]] = weights * network.scale
+            first.append(unordered)
+        self.first = np.hstack(first)
+        self.hidden = weights.shape[1]
+        self.rest = network.layers[1:]
+        # Multiplying cells by this gives the stones in each side's pits.
+        self.side_sums = np.zeros((size, 2), dtype=np.float32)
+        self.side_sums[self.sides[0], 0] = 1
+        self.side_sums[self.sides[1], 1] = 1
+
+    def _solved(self, cells):
+        """ Returns the exact score of a finished game's cells. """
+        side1, side2 = self.sides
+        scores = self.variant.final_scores(cells[side1.stop], sum(cells[side1]),
+                                           cells[-1], sum(cells[side2]))
+        lead = scores[0] - scores[1]
+        return solved_score(lead if self.number == 1 else -lead)
+
+    def _values(self, outputs):
+        """ Returns the network values from first layer outputs, with
+        the activations of Network.forward.
+        """
+        last = len(self.rest)
+        if last:
+            outputs = np.maximum(outputs + self.first_biases, 0)
+        else:
+            outputs = outputs + self.first_biases
+        for index, (weights, biases) in enumerate(self.rest, 1):
+            outputs = _product(outputs, weights) + biases
+            if index < last:
+                outputs = np.maximum(outputs, 0)
+        return np.tanh(outputs)
+
+    def __call__(self, position, is_max):
+        # Scored as a batch of one, so a position scores exactly the
+        # same whether the search evaluates it alone or in a batch.
+        return self.evaluate_batch([position.cells.tolist()], [is_max])[0]
+
+    def evaluate_batch(self, rows, is_max):
+        """ Returns the scores of many positions at once.
+
+        rows: cells of each position
+        is_max: whether the searching player is to move in each
+        """
+        cells = np.array(rows, dtype=np.float32)
+        is_max = np.array(is_max)
+        outputs = _product(cells, self.first)
+        hidden = self.hidden
+        outputs = np.where(is_max[:, None], outputs[:, :hidden], outputs[:, hidden:])
+        values = self._values(outputs)[:, 0] * VALUE_SCALE
+        scores = np.where(is_max, values, -values).tolist()
+        finished = np.flatnonzero(np.dot(cells, self.side_sums).min(1) == 0)
+        for index in finished:
+            scores[index] = self._solved(rows[index])
+        return scores
+
+
+def load_shards(directory):
+    """ Returns (cells, player to move, result, variant) from all the
+    self-play shards in directory.
+    """
+    cells = []
+    numbers = []
+    results = []
+    variant = None
+    for filename in sorted(glob.glob(os.path.join(directory, "shard-*.npz"))):
+        with np.load(filename) as shard:
+            cells.append(shard['cells'])
+            numbers.append(shard['number'])
+            results.append(shard['result'])
+            variant = Variant.from_flags(*shard['variant'].tolist())
+    if variant is None:
+        raise ValueError("No shards in %s" % directory)
+    return (np.concatenate(cells), np.concatenate(numbers).astype(np.intp),
+            np.concatenate(results).astype(np.float32), variant)
+
+
+def _loss(network, inputs, targets):
+    """ Returns the mean squared error of network on inputs. """
+    return float(np.mean((network.forward(inputs)[-1] - targets) ** 2))
+
+
+def train(directory, hidden=HIDDEN, epochs=EPOCHS, batch_size=BATCH_SIZE,
+          learning_rate=LEARNING_RATE, seed=SEED):
+    """ Trains a network on the shards in directory with Adam, printing
+    training and validation loss after every epoch.
+
+    Returns: the trained Network.
+    """
+    cells, numbers, results, variant = load_shards(directory)
+    network = Network.random(hidden, variant, seed)
+    inputs = network.inputs(cells, numbers)
+    rng = np.random.RandomState(seed)
+    order = rng.permutation(len(inputs))
+    held = int(len(inputs) * VALIDATION)
+    test, train_rows = order[:held], order[held:]
+
+    parameters = [array for layer in network.layers for array in layer]
+    moments = [np.zeros_like(array) for array in parameters]
+    squares = [np.zeros_like(array) for array in parameters]
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    step = 0
+    for epoch in range(epochs):
+        rng.shuffle(train_rows)
+        for start in range(0, len(train_rows), batch_size):
+            batch = train_rows[start:start + batch_size]
+            activations = network.forward(inputs[batch])
+            output = activations[-1]
+            # Gradient of the squared error through tanh.
+            delta = (2.0 / len(batch) * (output - results[batch]) *
+                     (1 - output ** 2))[:, None]
+            gradients = []
+            for index in reversed(range(len(network.layers))):
+                weights = network.layers[index][0]
+                below = activations[index]
+                gradients[:0] = [np.dot(below.T, delta), delta.sum(0)]
+                if index:
+                    delta = np.dot(delta, weights.T) * (below > 0)
+
+            step += 1
+            correction = np.sqrt(1 - beta2 ** step) / (1 - beta1 ** step)
+            for array, gradient, moment, square in zip(parameters, gradients,
+                                                       moments, squares):
+                moment *= beta1
+                moment += (1 - beta1) * gradient
+                square *= beta2
+                square += (1 - beta2) * gradient ** 2
+                array -= (learning_rate * correction * moment /
+                          (np.sqrt(square) + epsilon)).astype(np.float32)
+
+        print "Epoch %d: train loss %.4f, validation loss %.4f" % (
+            epoch + 1, _loss(network, inputs[train_rows], results[train_rows]),
+            _loss(network, inputs[test], results[test]))
+    return network
+
+
+def main():
+    """ Trains a network from the command line. """
+    parser = argparse.ArgumentParser(description="Train an evaluation network.")
+    parser.add_argument('directory', help="directory of self-play shards")
+    parser.add_argument('-o', '--output', default=FILENAME)
+    parser.add_argument('-H', '--hidden', type=int, nargs='+', default=list(HIDDEN))
+    parser.add_argument('-e', '--epochs', type=int, default=EPOCHS)
+    parser.add_argument('-b', '--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('-l', '--learning-rate', type=float, default=LEARNING_RATE)
+    args = parser.parse_args()
+
+    network = train(args.directory, args.hidden, args.epochs, args.batch_size,
+                    args.learning_rate)
+    network.save(args.output)
+    print "Saved %s" % args.output
+
+
+if __name__ == '__main__':
+    main()
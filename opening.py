@@ -0,0 +1,140 @@
+""" Opening book of searched moves for the first turns of a match.
+
+The book is built offline: every position reachable in the first few
+turns from the starting board (following free move chains within a
+turn) is searched deeply by an AI profile, and its best move stored
+under the position's Zobrist key. The file is a short header followed
+by one packed (key, move) record per position.
+
+Usage: python opening.py PROFILE TURNS DEPTH [FILENAME]
+where PROFILE is M (Minimax) or H (HillSearch).
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import struct
+import sys
+
+from flatboard import FlatBoard
+from search import flip_number
+from transposition import get_zobrist
+from variants import STANDARD, Variant
+
+MAGIC = 'MOBK'
+# Magic, pits per player, stones per pit, variant rule flags, number
+# of records.
+HEADER = struct.Struct('<4sBBBI')
+RECORD = struct.Struct('<QB')
+FILENAME = "opening.book"
+
+# Loaded books, keyed by filename.
+_LOADED = {}
+
+
+def book_key(position, number):
+    """ Returns the book key of a FlatBoard with player number to move. """
+    if position.zobrist is None:
+        position.set_zobrist(get_zobrist(position.size, sum(position.cells)))
+    return position.key ^ position.zobrist.side[number]
+
+
+def opening_positions(turns, variant=STANDARD):
+    """ Returns (position, number) for every distinct position with
+    player number to move in the first turns turns of a match.
+    """
+    position = FlatBoard(variant=variant)
+    found = {}
+    # Earliest turn each position was reached in.
+    turn_found = {}
+
+    def visit(number, turn):
+        key = book_key(position, number)
+        if turn_found.get(key, turns) <= turn:
+            return
+        turn_found[key] = turn
+        found[key] = (position.copy(), number)
+        for move in position.eligible_moves(number):
+            free_move, undo = position.make_move(number, move)
+            if not (position.side_empty(1) or position.side_empty(2)):
+                # Free moves stay within the turn, even the last one.
+                if free_move:
+                    visit(number, turn)
+                elif turn + 1 < turns:
+                    visit(flip_number(number), turn + 1)
+            position.unmake_move(undo)
+
+    visit(1, 0)
+    return found.values()
+
+
+class OpeningBook(object):
+    """ Best moves for opening positions of a variant, keyed by position. """
+
+    def __init__(self, variant=STANDARD, moves=None):
+        self.variant = variant
+        self.moves = moves if moves is not None else {}
+
+    def probe(self, position, number):
+        """ Returns the book move for player number, or None. """
+        if position.variant != self.variant:
+            return None
+        return self.moves.get(book_key(position, number))
+
+    def save(self, filename=FILENAME):
+        """ Writes the book to filename. """
+        with open(filename, 'wb') as f:
+            variant = self.variant
+            f.write(HEADER.pack(MAGIC, variant.pits, variant.stones,
+                                variant.flags, len(self.moves)))
+            for key in sorted(self.moves):
+                f.write(RECORD.pack(key, self.moves[key]))
+
+    @classmethod
+    def read(cls, filename=FILENAME):
+        """ Returns the book stored in filename. """
+        with open(filename, 'rb') as f:
+            data = f.read()
+        magic, pits, stones, flags, count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not an opening book: %s" % filename)
+        moves = {}
+        for i in range(count):
+            key, move = RECORD.unpack_from(data, HEADER.size + i * RECORD.size)
+            moves[key] = move
+        return cls(Variant.from_flags(pits, stones, flags), moves)
+
+
+def build(profile_type, turns, depth, variant=STANDARD):
+    """ Returns an OpeningBook of profile_type's best move, searched to
+    depth, for every position in the first turns turns of variant.
+    """
+    book = OpeningBook(variant)
+    engines = {}
+    for position, number in opening_positions(turns, variant):
+        if number not in engines:
+            engines[number] = profile_type(number, None).make_engine()
+        score, move = engines[number].search(position.copy(), number, depth)
+        if move is not None:
+            book.moves[book_key(position, number)] = move
+    return book
+
+
+def load(filename=FILENAME):
+    """ Returns the (cached) book stored in filename. """
+    book = _LOADED.get(filename)
+    if book is None:
+        book = _LOADED[filename] = OpeningBook.read(filename)
+    return book
+
+
+if __name__ == '__main__':
+    from ai_profiles import HillSearchAI, MinimaxAI
+    profile_type = {'M': MinimaxAI, 'H': HillSearchAI}[sys.argv[1]]
+    book = build(profile_type, int(sys.argv[2]), int(sys.argv[3]))
+    if len(sys.argv) > 4:
+        book.save(sys.argv[4])
+    else:
+        book.save()
+    print "Stored %d positions" % len(book.moves)
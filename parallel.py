@@ -0,0 +1,93 @@
+""" Module for splitting an AI search across worker processes.
+
+The first root move (in search order) is searched in the calling
+process to establish a good bound. The remaining root moves are then
+farmed out to a process pool. Workers read the best root score found
+so far from shared memory before searching their move, and publish
+their own score when done, so later moves are searched with the
+tightest bound available.
+"""
+import multiprocessing
+
+from search import INFINITY, SearchStats, get_engine, order_moves
+
+# Best root score so far, shared with the workers of a pool.
+_shared_alpha = None
+
+
+def _init_worker(shared_alpha):
+    """ Pool initializer storing the shared root bound. """
+    global _shared_alpha
+    _shared_alpha = shared_alpha
+
+
+def _publish(shared_alpha, score):
+    """ Raises the shared root bound to score. """
+    with shared_alpha.get_lock():
+        if score > shared_alpha.value:
+            shared_alpha.value = score
+
+
+def _search_root_move(task):
+    """ Worker entry point. Returns move, score and the SearchStats of
+    searching one root move.
+    """
+    profile_type, number, variant, cells, move, depth = task
+    engine = get_engine(profile_type, number)
+    # Which moves a worker searched before depends on scheduling, so
+    # entries kept from them would make results differ from run to run.
+    engine.table.clear()
+    engine.stats = SearchStats()
+    position = profile_type.position_type(cells=cells, variant=variant)
+    # Search just below the best score so ties come back exact.
+    alpha = _shared_alpha.value - 1
+    score = engine.score_move(position, number, move, depth, alpha)
+    _publish(_shared_alpha, score)
+    return move, score, engine.stats
+
+
+class ParallelSearch(object):
+    """ Root-split search for an AI profile over a process pool.
+
+    profile_type must be constructible as profile_type(number, None) and
+    provide make_engine and position_type, as MinimaxAI does. Results are the same as
+    AlphaBetaSearch.search at the same depth with a fresh table.
+    """
+
+    def __init__(self, profile_type, number, processes=None):
+        self.profile_type = profile_type
+        self.number = number
+        self.shared_alpha = multiprocessing.Value('d', -INFINITY)
+        self.pool = multiprocessing.Pool(processes, _init_worker,
+                                         (self.shared_alpha,))
+
+    def search(self, position, depth, engine):
+        """ Returns best score, best move for position at depth.
+
+        engine: AlphaBetaSearch used to search the first root move in
+        this process. The workers' stats are added to its stats.
+        """
+        number = self.number
+        moves = order_moves(position.pits(number))
+        if depth == 0 or not moves:
+            return engine.search(position, number, depth)
+
+        engine.stats.depth = depth
+        best = engine.score_move(position, number, moves[0], depth)
+        best_move = moves[0]
+        self.shared_alpha.value = best
+
+        cells = position.cells.tolist()
+        tasks = [(self.profile_type, number, position.variant, cells, move, depth)
+                 for move in moves[1:]]
+        for move, score, stats in self.pool.imap_unordered(_search_root_move, tasks):
+            engine.stats.add(stats)
+            if score > best or (score == best and move > best_move):
+                best = score
+                best_move = move
+        return best, best_move
+
+    def close(self):
+        """ Shuts down the worker processes. """
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,146 @@
+""" Perft: counting move sequences to check and time the move generator.
+
+perft counts the move sequences of a given length from a position.
+Free moves count as moves of their own, so a free move chain of two
+moves is two plies deep, and games that end early add nothing. The
+counts are a known answer for the move generator, and the time they
+take is its raw speed.
+
+check_perft counts the same tree moving stones three ways at every
+node: Board._move_stones on a live board, Board._dummy_move_stones
+and FlatBoard.make_move. Any disagreement raises PerftMismatch.
+
+Usage: python perft.py DEPTH [-p CELLS] [-n NUMBER] [--pits PITS]
+                        [--stones STONES] [--flags FLAGS] [--divide | --check]
+where CELLS is the FlatBoard cells separated by commas, 14 with the
+standard six pits, and FLAGS the variant rule flags as in Variant.flags.
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import argparse
+import copy
+import time
+
+from board import Board
+from flatboard import FlatBoard
+from search import flip_number
+from variants import Variant
+
+
+class PerftMismatch(Exception):
+    """ Exception flagged when move generation paths disagree. """
+    pass
+
+
+def perft(position, number, depth):
+    """ Returns the number of move sequences depth moves long from a
+    FlatBoard, with player number to move.
+    """
+    if depth == 0:
+        return 1
+    if position.game_over():
+        return 0
+    count = 0
+    for move in position.eligible_moves(number):
+        free_move, undo = position.make_move(number, move)
+        count += perft(position, number if free_move else flip_number(number),
+                       depth - 1)
+        position.unmake_move(undo)
+    return count
+
+
+def divide(position, number, depth):
+    """ Returns (move, perft count below move) for every root move. """
+    counts = []
+    if depth == 0 or position.game_over():
+        return counts
+    for move in position.eligible_moves(number):
+        free_move, undo = position.make_move(number, move)
+        counts.append((move, perft(position,
+                                   number if free_move else flip_number(number),
+                                   depth - 1)))
+        position.unmake_move(undo)
+    return counts
+
+
+def check_perft(position, number, depth):
+    """ Returns perft of a FlatBoard, moving stones with the live board,
+    dummy board and FlatBoard paths at every node and raising
+    PerftMismatch where they disagree.
+    """
+    if depth == 0:
+        return 1
+    if position.game_over():
+        return 0
+    variant = position.variant
+    state = position.to_board()
+    dummy = Board(headless=True, variant=variant)
+    count = 0
+    for move in position.eligible_moves(number):
+        live = Board(test_state=copy.deepcopy(state), headless=True,
+                     variant=variant)
+        live_state, live_free = live._move_stones(number, move)
+        dummy_state, dummy_free = dummy._dummy_move_stones(number, move, state)
+        free_move, undo = position.make_move(number, move)
+        flat_state = position.to_board()
+        if not (live_state == dummy_state == flat_state and
+                live_free == dummy_free == free_move):
+            raise PerftMismatch(
+                "Player %d moving %d from %s: live %s %s, dummy %s %s, flat %s %s" %
+                (number, move, state, live_state, live_free, dummy_state,
+                 dummy_free, flat_state, free_move))
+        count += check_perft(position,
+                             number if free_move else flip_number(number),
+                             depth - 1)
+        position.unmake_move(undo)
+    return count
+
+
+def main():
+    """ Runs perft from the command line. """
+    parser = argparse.ArgumentParser(description="Count move sequences to a depth.")
+    parser.add_argument('depth', type=int)
+    parser.add_argument('-p', '--position', help="FlatBoard cells, comma separated")
+    parser.add_argument('-n', '--number', type=int, default=1,
+                        help="player to move")
+    parser.add_argument('--pits', type=int, default=6, help="pits per player")
+    parser.add_argument('--stones', type=int, default=4, help="stones per pit")
+    parser.add_argument('--flags', type=int, default=0, help="variant rule flags")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--divide', action='store_true',
+                      help="print the count below every root move")
+    mode.add_argument('--check', action='store_true',
+                      help="cross-check the live and dummy board paths")
+    args = parser.parse_args()
+
+    variant = Variant.from_flags(args.pits, args.stones, args.flags)
+    if args.position:
+        cells = [int(cell) for cell in args.position.split(',')]
+        if len(cells) != variant.pits * 2 + 2:
+            parser.error("expected %d cells for %d pits, got %d" %
+                         (variant.pits * 2 + 2, variant.pits, len(cells)))
+        position = FlatBoard(cells=cells, variant=variant)
+    else:
+        position = FlatBoard(variant=variant)
+
+    start = time.time()
+    if args.check:
+        nodes = check_perft(position, args.number, args.depth)
+    elif args.divide:
+        counts = divide(position, args.number, args.depth)
+        for move, count in counts:
+            print "%d: %d" % (move, count)
+        nodes = sum(count for move, count in counts)
+    else:
+        nodes = perft(position, args.number, args.depth)
+    elapsed = time.time() - start
+
+    print "Nodes: %d" % nodes
+    print "Time: %.3fs (%.0f nodes/sec)" % (elapsed, nodes / elapsed if elapsed else 0)
+
+
+if __name__ == '__main__':
+    main()
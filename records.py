@@ -0,0 +1,245 @@
+""" Compact binary records of played games.
+
+A records file is a short header followed by one record per game,
+appended as games finish. Each record is its length and then, as
+unsigned varints (seven bits per byte, low bits first):
+
+    pits, stones, variant rule flags
+    player 1 name length, name bytes, player 2 name length, name bytes
+    player 1 score, player 2 score
+    move count, then pit index * 2 + free move earned for every move
+
+Games start from the variant's starting board with player 1 to move,
+so whose move each one was follows from the free move markers. A
+standard game between two profiles takes around 60 bytes.
+
+read_records is a generator reading the file in blocks, so files of
+millions of games can be gone through without loading them. A record
+cut short at the end of the file, as a writer stopped mid-write
+leaves it, ends the iteration.
+
+Usage: python records.py FILENAME
+prints a summary of the games in FILENAME.
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import os
+import struct
+import sys
+
+from flatboard import FlatBoard
+from search import flip_number
+from variants import STANDARD, Variant
+
+MAGIC = 'MGRC'
+VERSION = 1
+# Magic, format version.
+HEADER = struct.Struct('<4sB')
+FILENAME = "games.rec"
+
+# Bytes read from a records file at a time.
+BLOCK_SIZE = 1 << 16
+
+
+class GameRecord(object):
+    """ The moves and result of one game.
+
+    variant: the Variant played
+    players: (player 1, player 2) names
+    moves: (player number, pit index, earned free move) for every move,
+        as GameResult keeps them
+    scores: final (player 1, player 2) scores
+    """
+
+    def __init__(self, variant, players, moves, scores):
+        self.variant = variant
+        self.players = players
+        self.moves = moves
+        self.scores = scores
+
+    @classmethod
+    def from_result(cls, result, players, variant=STANDARD):
+        """ Returns the record of a Match's GameResult. """
+        return cls(variant, players, result.moves, result.scores)
+
+    @property
+    def winner(self):
+        """ Returns the winning player number, or 0 for a draw. """
+        if self.scores[0] > self.scores[1]:
+            return 1
+        elif self.scores[1] > self.scores[0]:
+            return 2
+        else:
+            return 0
+
+    def replay(self):
+        """ Yields (position, number, move) before every move, where
+        position is one FlatBoard played forward as iteration goes on.
+        """
+        position = FlatBoard(variant=self.variant)
+        for number, move, free_move in self.moves:
+            yield position, number, move
+            position.make_move(number, move)
+
+
+def _append_varint(out, value):
+    """ Appends value to the bytearray out as an unsigned varint. """
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, offset):
+    """ Returns (value, offset after it) for the varint at offset in a
+    bytearray. Raises IndexError when data ends inside it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_record(record):
+    """ Returns a record as bytes, length prefix included. """
+    body = bytearray()
+    variant = record.variant
+    _append_varint(body, variant.pits)
+    _append_varint(body, variant.stones)
+    _append_varint(body, variant.flags)
+    for name in record.players:
+        name = name.encode('utf-8')
+        _append_varint(body, len(name))
+        body.extend(name)
+    _append_varint(body, record.scores[0])
+    _append_varint(body, record.scores[1])
+    _append_varint(body, len(record.moves))
+    for number, move, free_move in record.moves:
+        _append_varint(body, move * 2 + bool(free_move))
+
+    out = bytearray()
+    _append_varint(out, len(body))
+    out.extend(body)
+    return bytes(out)
+
+
+def decode_record(data, offset=0):
+    """ Returns the GameRecord encoded in a bytearray from offset, the
+    length prefix excluded.
+    """
+    pits, offset = _read_varint(data, offset)
+    stones, offset = _read_varint(data, offset)
+    flags, offset = _read_varint(data, offset)
+    players = []
+    for _ in range(2):
+        length, offset = _read_varint(data, offset)
+        players.append(bytes(data[offset:offset + length]).decode('utf-8'))
+        offset += length
+    score1, offset = _read_varint(data, offset)
+    score2, offset = _read_varint(data, offset)
+    count, offset = _read_varint(data, offset)
+    moves = []
+    number = 1
+    for _ in range(count):
+        value, offset = _read_varint(data, offset)
+        free_move = bool(value & 1)
+        moves.append((number, value >> 1, free_move))
+        if not free_move:
+            number = flip_number(number)
+    return GameRecord(Variant.from_flags(pits, stones, flags), tuple(players),
+                      moves, (score1, score2))
+
+
+class RecordWriter(object):
+    """ Appends game records to a file, writing the header if it is new.
+
+    Use as a context manager, or close when done.
+    """
+
+    def __init__(self, filename=FILENAME):
+        self.filename = filename
+        new_file = not os.path.isfile(filename) or not os.path.getsize(filename)
+        self.file = open(filename, 'ab')
+        if new_file:
+            self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.count = 0
+
+    def write(self, record):
+        """ Appends a GameRecord, or a record already encoded. """
+        if isinstance(record, GameRecord):
+            record = encode_record(record)
+        self.file.write(record)
+        self.count += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_records(filename=FILENAME):
+    """ Yields the GameRecords in a records file in the order written. """
+    with open(filename, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        magic, version = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("Not a game records file: %s" % filename)
+        if version != VERSION:
+            raise ValueError("Unsupported records version %d: %s" % (version, filename))
+
+        data = bytearray()
+        offset = 0
+        while True:
+            try:
+                length, start = _read_varint(data, offset)
+                if start + length > len(data):
+                    raise IndexError
+            except IndexError:
+                # Record incomplete: keep its start and read more.
+                block = f.read(BLOCK_SIZE)
+                if not block:
+                    return
+                data = data[offset:]
+                data.extend(block)
+                offset = 0
+                continue
+            yield decode_record(data, start)
+            offset = start + length
+
+
+def summarize(filename=FILENAME):
+    """ Prints the games, wins and average length per pairing in a
+    records file.
+    """
+    pairings = {}
+    for record in read_records(filename):
+        totals = pairings.setdefault(record.players, [0, 0, 0, 0, 0])
+        totals[record.winner] += 1
+        totals[3] += 1
+        totals[4] += len(record.moves)
+    for players in sorted(pairings):
+        draws, wins1, wins2, games, moves = pairings[players]
+        print "%s vs %s: %d games, %d-%d-%d, %.1f moves/game" % (
+            players[0], players[1], games, wins1, wins2, draws,
+            moves / float(games))
+
+
+if __name__ == '__main__':
+    summarize(sys.argv[1] if len(sys.argv) > 1 else FILENAME)
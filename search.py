@@ -0,0 +1,515 @@
+""" Module for depth-first game tree search. """
+import time
+
+from transposition import EXACT, LOWER, UPPER, get_zobrist
+
+# Larger than any board evaluation.
+INFINITY = float('inf')
+
+# Nodes searched between checks of the deadline.
+CHECK_INTERVAL = 256
+
+# Added to the final lead in finished games and games solved by the
+# endgame database, so they outrank any heuristic score. Every
+# evaluation keeps unfinished positions within +-SOLVED_SCORE.
+SOLVED_SCORE = 1000
+
+
+# Search engines of a process, keyed by (profile type, number).
+_engines = {}
+
+
+class SearchTimeout(Exception):
+    """ Exception flagged inside a search once its deadline has passed. """
+    pass
+
+
+class SearchStats(object):
+    """ Work done by a search, or by several searches added together.
+
+    generated: nodes entered below the root
+    evaluated: positions scored by the evaluation function
+    cutoffs: moves skipped because a bound was reached
+    tt_hits: transposition table probes that found the position
+    max_depth: deepest ply from the root reached
+    depth: nominal depth searched (deepest completed iteration)
+    elapsed: wall time in seconds, set by whoever timed the search
+    searches: number of searches added together
+    """
+
+    FIELDS = ('generated', 'evaluated', 'cutoffs', 'tt_hits', 'max_depth',
+              'depth', 'elapsed', 'searches')
+
+    def __init__(self):
+        self.generated = 0
+        self.evaluated = 0
+        self.cutoffs = 0
+        self.tt_hits = 0
+        self.max_depth = 0
+        self.depth = 0
+        self.elapsed = 0.0
+        self.searches = 1
+        # Branching factors of the combined searches that went below
+        # the root, None for a single search.
+        self.branching_factors = None
+
+    def __repr__(self):
+        return "SearchStats(%s)" % ", ".join(
+            "%s=%r" % (field, getattr(self, field)) for field in self.FIELDS)
+
+    @property
+    def branching_factor(self):
+        """ Effective branching factor: the number b with b ** depth
+        equal to the nodes generated. Averaged over combined searches.
+        """
+        factors = self.branching_factors
+        if factors is not None:
+            return sum(factors) / len(factors) if factors else 0.0
+        if not self.depth or not self.generated:
+            return 0.0
+        return self.generated ** (1.0 / self.depth)
+
+    def add(self, other):
+        """ Adds the counts of other, a search made as part of this one
+        (e.g. by a worker process).
+        """
+        self.generated += other.generated
+        self.evaluated += other.evaluated
+        self.cutoffs += other.cutoffs
+        self.tt_hits += other.tt_hits
+        self.max_depth = max(self.max_depth, other.max_depth)
+
+    @classmethod
+    def combine(cls, stats):
+        """ Returns the total of a list of separate searches, such as
+        every move a player made in a game.
+        """
+        total = cls()
+        total.searches = len(stats)
+        total.branching_factors = []
+        for item in stats:
+            total.add(item)
+            total.depth = max(total.depth, item.depth)
+            total.elapsed += item.elapsed
+            if item.depth and item.generated:
+                total.branching_factors.append(item.branching_factor)
+        return total
+
+    def as_dict(self):
+        """ Returns the stats as a plain dict, for reports. """
+        result = dict((field, getattr(self, field)) for field in self.FIELDS)
+        result['branching_factor'] = self.branching_factor
+        return result
+
+
+def flip_number(number):
+    """ Returns the number of the opposing player. """
+    if number == 1:
+        return 2
+    else:
+        return 1
+
+
+def get_engine(profile_type, number):
+    """ Returns the process's engine for profile_type playing number,
+    made on first use by profile_type(number, None).make_engine().
+    """
+    engine = _engines.get((profile_type, number))
+    if engine is None:
+        engine = _engines[(profile_type, number)] = profile_type(number, None).make_engine()
+    return engine
+
+
+def solved_score(lead):
+    """ Returns the score of a game known to end lead stones ahead. """
+    if lead > 0:
+        return lead + SOLVED_SCORE
+    elif lead < 0:
+        return lead - SOLVED_SCORE
+    else:
+        return 0
+
+
+def store_lead(position, number):
+    """ Returns the store lead of player number in a FlatBoard, scored
+    exactly with solved_score once the game is over.
+    """
+    if position.game_over():
+        scores = position.final_scores()
+        lead = scores[0] - scores[1]
+        return solved_score(lead if number == 1 else -lead)
+    return position.store(number) - position.store(flip_number(number))
+
+
+def order_moves(pits, first=None):
+    """ Returns eligible moves for the given pits, free turns first,
+    then captures, then the remaining moves. Each group is kept in
+    ascending index order.
+
+    first: a move (e.g. from the transposition table) to try before all
+    others when it is eligible.
+    """
+    num_pits = len(pits)
+    free_turns = []
+    captures = []
+    others = []
+    for i in range(num_pits):
+        stones = pits[i]
+        if not stones or i == first:
+            continue
+        land = i + stones
+        if stones == num_pits - i:
+            free_turns.append(i)
+        elif land < num_pits and not pits[land]:
+            captures.append(i)
+        elif (num_pits * 2 < land <= num_pits * 2 + 1 + i
+              and (land == num_pits * 2 + 1 + i or not pits[land - num_pits * 2 - 1])):
+            # Lap around the board back into an empty pit of our own,
+            # or all the way round into the pit just emptied.
+            captures.append(i)
+        else:
+            others.append(i)
+    if first is not None and pits[first]:
+        return [first] + free_turns + captures + others
+    return free_turns + captures + others
+
+
+class AlphaBetaSearch(object):
+    """ Depth-first alpha-beta search which scores nodes as they are
+    generated instead of materializing the whole game tree.
+
+    Positions are FlatBoards, searched with make_move/unmake_move so no
+    board is copied during the search.
+
+    Matches MinimaxAI.minimax: a node is a leaf when depth runs out or
+    the game is over, and ties at the root go
+    to the highest move index. With a transposition table, positions
+    already searched at least as deep are looked up instead, and with
+    an endgame database positions with few seeds left are scored
+    exactly without searching.
+
+    When evaluate also has an evaluate_batch(rows, is_max) method,
+    taking lists of cells and is_max flags and returning a score for
+    each, the leaf children of every node one move above the leaves
+    are scored in a single call. Scores come out the same; only the
+    number of leaves evaluated grows, as none are cut off.
+    """
+
+    def __init__(self, evaluate, extend_free_moves=False, table=None,
+                 endgame=None):
+        """ evaluate: callable(position, is_max) returning a score
+        extend_free_moves: when set, free moves do not consume depth
+        table: optional TranspositionTable shared between searches
+        endgame: optional EndgameDatabase
+        """
+        self.evaluate = evaluate
+        self.evaluate_batch = getattr(evaluate, 'evaluate_batch', None)
+        self.extend_free_moves = extend_free_moves
+        self.table = table
+        self.endgame = endgame
+        # Stones in play, set at the start of every search.
+        self.total = 0
+        # Wall clock time (from time.time) at which to abandon a search.
+        self.deadline = None
+        # Counters, added to by every search until replaced.
+        self.stats = SearchStats()
+
+    def iterative_deepening(self, position, number, time_budget, max_depth):
+        """ Searches depth 1, 2, 3... until time_budget milliseconds have
+        passed or max_depth is searched, trying the previous iteration's
+        best move first each time.
+
+        Returns: score, move and depth of the deepest completed search.
+        Depth 1 always completes, so a move is returned even when the
+        budget is too small for anything more.
+        """
+        deadline = time.time() + time_budget / 1000.0
+        self.deadline = None
+        score, move = self.search(position.copy(), number, 1)
+        completed = 1
+        for depth in range(2, max_depth + 1):
+            if time.time() >= deadline:
+                break
+            self.deadline = deadline
+            try:
+                score, move = self.search(position.copy(), number, depth, move)
+            except SearchTimeout:
+                break
+            finally:
+                self.deadline = None
+            completed = depth
+        self.stats.depth = completed
+        return score, move, completed
+
+    def search(self, position, number, depth, first=None):
+        """ Returns best score, best move for player number.
+
+        first: move to search first, ahead of the transposition table's.
+        """
+        stats = self.stats
+        stats.depth = depth
+        if depth == 0 or position.game_over():
+            stats.evaluated += 1
+            return self.evaluate(position, True), None
+
+        self._prepare(position)
+        table = self.table
+        tt_move = None
+        if table is not None:
+            table.new_search()
+            key = position.key ^ position.zobrist.side[number]
+            entry = table.probe(key)
+            if entry is not None:
+                stats.tt_hits += 1
+                tt_move = entry[4]
+        if first is not None:
+            tt_move = first
+
+        best = None
+        best_move = None
+        for move in order_moves(position.pits(number), tt_move):
+            # Search just below the best score so ties come back exact.
+            alpha = -INFINITY if best is None else best - 1
+            score = self.score_move(position, number, move, depth, alpha)
+            if best is None or score > best or (score == best and move > best_move):
+                best = score
+                best_move = move
+
+        if best is None:
+            stats.evaluated += 1
+            return self.evaluate(position, True), None
+        if table is not None:
+            table.store(key, depth, EXACT, best, best_move)
+        return best, best_move
+
+    def score_move(self, position, number, move, depth, alpha=-INFINITY,
+                   beta=INFINITY):
+        """ Returns the value of player number playing move at the root of
+        a depth search, within (alpha, beta).
+        """
+        self._prepare(position)
+        free_move, undo = position.make_move(number, move)
+        if free_move:
+            new_depth = depth if self.extend_free_moves else depth - 1
+            score = self._alphabeta(position, number, new_depth, True,
+                                    alpha, beta, 1)
+        else:
+            score = self._alphabeta(position, flip_number(number), depth - 1,
+                                    False, alpha, beta, 1)
+        position.unmake_move(undo)
+        return score
+
+    def principal_variation(self, position, number, move, depth):
+        """ Returns the expected line of play from position as (player
+        number, move) pairs, starting with number playing move and
+        following best moves stored in the transposition table for up
+        to depth moves in all.
+        """
+        self._prepare(position)
+        line = []
+        undos = []
+        while move is not None and len(line) < depth:
+            line.append((number, move))
+            free_move, undo = position.make_move(number, move)
+            undos.append(undo)
+            if not free_move:
+                number = flip_number(number)
+            move = None
+            if self.table is not None and not position.game_over():
+                entry = self.table.probe(position.key ^ position.zobrist.side[number])
+                if entry is not None and entry[4] in position.eligible_moves(number):
+                    move = entry[4]
+        for undo in reversed(undos):
+            position.unmake_move(undo)
+        return line
+
+    def _prepare(self, position):
+        """ Readies the engine and position for searching position. """
+        self.total = sum(position.cells)
+        if self.table is not None and position.zobrist is None:
+            position.set_zobrist(get_zobrist(position.size, self.total))
+
+    def _probe_endgame(self, position, number, is_max):
+        """ Returns the exact score of position from the endgame
+        database, or None when it is not covered.
+        """
+        endgame = self.endgame
+        cells = position.cells
+        stores = position.stores
+        if self.total - cells[stores[1]] - cells[stores[2]] > endgame.max_seeds:
+            return None
+        value = endgame.probe(position, number)
+        if value is None:
+            return None
+        # Lead of the player searched for, the max player.
+        if is_max:
+            lead = cells[stores[number]] - cells[stores[flip_number(number)]] + value
+        else:
+            lead = cells[stores[flip_number(number)]] - cells[stores[number]] - value
+        return solved_score(lead)
+
+    def _alphabeta(self, position, number, depth, is_max, alpha, beta, ply):
+        """ Returns the minimax value of position, ply moves below the
+        root, within (alpha, beta).
+        """
+        stats = self.stats
+        stats.generated += 1
+        if ply > stats.max_depth:
+            stats.max_depth = ply
+        if (self.deadline is not None and not stats.generated % CHECK_INTERVAL
+                and time.time() > self.deadline):
+            raise SearchTimeout
+
+        if self.endgame is not None:
+            score = self._probe_endgame(position, number, is_max)
+            if score is not None:
+                return score
+
+        if depth == 0 or position.game_over():
+            stats.evaluated += 1
+            return self.evaluate(position, is_max)
+
+        table = self.table
+        tt_move = None
+        if table is not None:
+            key = position.key ^ position.zobrist.side[number]
+            entry = table.probe(key)
+            if entry is not None:
+                stats.tt_hits += 1
+                if entry[1] >= depth:
+                    bound = entry[2]
+                    value = entry[3]
+                    if (bound == EXACT or (bound == LOWER and value >= beta)
+                            or (bound == UPPER and value <= alpha)):
+                        return value
+                tt_move = entry[4]
+
+        moves = order_moves(position.pits(number), tt_move)
+        if not moves:
+            stats.evaluated += 1
+            return self.evaluate(position, is_max)
+
+        orig_alpha = alpha
+        orig_beta = beta
+        best_move = None
+        other = flip_number(number)
+        free_depth = depth if self.extend_free_moves else depth - 1
+        ply += 1
+        if depth == 1 and self.evaluate_batch is not None:
+            value, best_move = self._frontier(position, number, is_max, moves,
+                                              alpha, beta, ply)
+        elif is_max:
+            value = -INFINITY
+            for move in moves:
+                free_move, undo = position.make_move(number, move)
+                if free_move:
+                    score = self._alphabeta(position, number, free_depth, True,
+                                            alpha, beta, ply)
+                else:
+                    score = self._alphabeta(position, other, depth - 1, False,
+                                            alpha, beta, ply)
+                position.unmake_move(undo)
+                if score > value:
+                    value = score
+                    best_move = move
+                    if value > alpha:
+                        alpha = value
+                        if alpha >= beta:
+                            stats.cutoffs += 1
+                            break
+        else:
+            value = INFINITY
+            for move in moves:
+                free_move, undo = position.make_move(number, move)
+                if free_move:
+                    score = self._alphabeta(position, number, free_depth, False,
+                                            alpha, beta, ply)
+                else:
+                    score = self._alphabeta(position, other, depth - 1, True,
+                                            alpha, beta, ply)
+                position.unmake_move(undo)
+                if score < value:
+                    value = score
+                    best_move = move
+                    if value < beta:
+                        beta = value
+                        if alpha >= beta:
+                            stats.cutoffs += 1
+                            break
+
+        if table is not None:
+            if value <= orig_alpha:
+                bound = UPPER
+            elif value >= orig_beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            table.store(key, depth, bound, value, best_move)
+        return value
+
+    def _frontier(self, position, number, is_max, moves, alpha, beta, ply):
+        """ Searches a node one move above the leaves like _alphabeta,
+        with its leaf children scored together by evaluate_batch.
+
+        Returns: value and best move of the node.
+        """
+        stats = self.stats
+        if ply > stats.max_depth:
+            stats.max_depth = ply
+        # _alphabeta's check can skip over the leaves counted here.
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SearchTimeout
+        other = flip_number(number)
+        # Score of each move's child, None for children searched on.
+        scores = [None] * len(moves)
+        rows = []
+        row_max = []
+        row_moves = []
+        for index, move in enumerate(moves):
+            free_move, undo = position.make_move(number, move)
+            if not (free_move and self.extend_free_moves) or position.game_over():
+                stats.generated += 1
+                child_max = is_max if free_move else not is_max
+                score = None
+                if self.endgame is not None:
+                    score = self._probe_endgame(position, number if free_move else other,
+                                                child_max)
+                if score is None:
+                    rows.append(position.cells.tolist())
+                    row_max.append(child_max)
+                    row_moves.append(index)
+                else:
+                    scores[index] = score
+            position.unmake_move(undo)
+        if rows:
+            stats.evaluated += len(rows)
+            for index, score in zip(row_moves, self.evaluate_batch(rows, row_max)):
+                scores[index] = score
+
+        value = -INFINITY if is_max else INFINITY
+        best_move = None
+        for index, move in enumerate(moves):
+            score = scores[index]
+            if score is None:
+                # A free move searched on at the same depth.
+                free_move, undo = position.make_move(number, move)
+                score = self._alphabeta(position, number, 1, is_max, alpha, beta, ply)
+                position.unmake_move(undo)
+            if is_max:
+                if score > value:
+                    value = score
+                    best_move = move
+                    if value > alpha:
+                        alpha = value
+                        if alpha >= beta:
+                            stats.cutoffs += 1
+                            break
+            elif score < value:
+                value = score
+                best_move = move
+                if value < beta:
+                    beta = value
+                    if alpha >= beta:
+                        stats.cutoffs += 1
+                        break
+        return value, best_move
@@ -0,0 +1,246 @@
+""" Self-play training data from the search AI profiles.
+
+Games between search profiles are played headless across a process
+pool, straight on boards with each profile's AlphaBetaSearch engine
+through the tuner's play_moves. Every game starts from a few random
+moves, so games differ, and every searched position is labelled with
+its search score, the move chosen and how the game ended for the
+player to move.
+
+Positions are written as NumPy shards (.npz), one column per array:
+
+    key      position's Zobrist key with the player to move (uint64)
+    cells    FlatBoard cells (uint8, or uint16 if stones need it)
+    number   player to move
+    move     pit index chosen
+    score    search score, in the searching profile's own scale
+    result   mean outcome for the player to move: 1 win, 0 draw, -1 loss
+    margin   mean final score difference for the player to move
+    count    games the position was reached in
+    variant  pits, stones and rule flags of the variant
+    games    games played into the directory up to this shard
+
+Repeated positions are deduplicated by key: within a shard their
+outcomes are averaged into one row, and positions already written to
+an earlier shard of the directory are dropped. Running again with the
+same directory adds shards after the ones there, continuing the game
+numbering where the last shard left off, so the new games get new
+openings.
+
+Usage: python selfplay.py GAMES DIRECTORY PROFILE [PROFILE ...]
+                          [-d DEPTH] [-s SHARD_SIZE] [-p PROCESSES]
+where each PROFILE is M (Minimax), H (HillSearch), E (Heuristic) or
+N (Neural).
+Every ordered pair of profiles, a profile against itself included,
+plays an equal share of the games.
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import argparse
+import glob
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from flatboard import FlatBoard
+from opening import book_key
+from search import SearchStats, get_engine
+from tuner import play_moves, random_opening
+from variants import STANDARD
+
+SHARD_PATTERN = "shard-%05d.npz"
+SEED = 1
+
+# Search depth, random opening moves and unique positions per shard.
+DEPTH = 6
+OPENING_MOVES = 4
+SHARD_SIZE = 1 << 20
+
+# Games handed to a worker at a time.
+CHUNK_SIZE = 4
+
+
+def _outcome(scores, number):
+    """ Returns (result, margin) of final scores for player number. """
+    margin = scores[number - 1] - scores[2 - number]
+    return cmp(margin, 0), margin
+
+
+def play_game(task):
+    """ Worker entry point. Plays one game and returns its searched
+    positions as (key, cells, number, move, score, result, margin)
+    tuples, key and cells as book_key and a list.
+    """
+    p1_type, p2_type, depth, seed, variant = task
+    cells, number = random_opening(random.Random(seed), OPENING_MOVES, variant)
+    engines = [None]
+    position_type = FlatBoard
+    for player, profile_type in ((1, p1_type), (2, p2_type)):
+        engine = get_engine(profile_type, player)
+        if engine.table is not None:
+            engine.table.clear()
+        engine.stats = SearchStats()
+        engines.append(engine)
+        # Every position type is a FlatBoard, so the game is played on
+        # the one the more demanding profile searches.
+        player_type = getattr(profile_type, 'position_type', FlatBoard)
+        if issubclass(player_type, position_type):
+            position_type = player_type
+    position = position_type(cells=cells, variant=variant)
+
+    searched = []
+    for number, move, score in play_moves(position, number, engines, depth):
+        searched.append((book_key(position, number), position.cells.tolist(),
+                         number, move, score))
+
+    scores = position.final_scores()
+    return [row + _outcome(scores, row[2]) for row in searched]
+
+
+def game_tasks(roster, games, depth=DEPTH, seed=SEED, variant=STANDARD,
+               first=0):
+    """ Yields a task per game, numbered from first, cycling through
+    every ordered pair of profiles in roster. Each game's opening comes
+    from seed and its number.
+    """
+    pairings = [(p1_type, p2_type) for p1_type in roster for p2_type in roster]
+    for game in range(first, first + games):
+        p1_type, p2_type = pairings[game % len(pairings)]
+        yield p1_type, p2_type, depth, seed * 1000003 + game, variant
+
+
+class ShardWriter(object):
+    """ Collects labelled positions and writes them out as shards. """
+
+    def __init__(self, directory, shard_size=SHARD_SIZE, variant=STANDARD):
+        self.directory = directory
+        self.shard_size = shard_size
+        self.variant = variant
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Keys of positions in written shards.
+        self.written = set()
+        # Games added, counting those in written shards.
+        self.games = 0
+        existing = sorted(glob.glob(os.path.join(directory, "shard-*.npz")))
+        for filename in existing:
+            with np.load(filename) as shard:
+                self.written.update(shard['key'].tolist())
+                if 'games' in shard.files:
+                    self.games = max(self.games, int(shard['games']))
+        self.shard = len(existing)
+        # Rows of the shard being collected, by key: [cells, number,
+        # move, score, result total, margin total, count].
+        self.rows = {}
+        self.positions = 0
+        self.duplicates = 0
+
+    def add(self, positions):
+        """ Adds the positions of one game. """
+        self.games += 1
+        rows = self.rows
+        for key, cells, number, move, score, result, margin in positions:
+            self.positions += 1
+            if key in self.written:
+                self.duplicates += 1
+                continue
+            row = rows.get(key)
+            if row is None:
+                rows[key] = [cells, number, move, score, result, margin, 1]
+            else:
+                self.duplicates += 1
+                row[4] += result
+                row[5] += margin
+                row[6] += 1
+        if len(rows) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """ Writes the positions collected so far as a shard. """
+        if not self.rows:
+            return
+        keys = sorted(self.rows)
+        rows = [self.rows[key] for key in keys]
+        variant = self.variant
+        counts = np.array([row[6] for row in rows], dtype=np.uint32)
+        games = counts.astype(np.float32)
+        cell_type = np.uint8 if variant.pits * 2 * variant.stones < 256 else np.uint16
+        filename = os.path.join(self.directory, SHARD_PATTERN % self.shard)
+        with open(filename, 'wb') as f:
+            np.savez(f,
+                     key=np.array(keys, dtype=np.uint64),
+                     cells=np.array([row[0] for row in rows], dtype=cell_type),
+                     number=np.array([row[1] for row in rows], dtype=np.uint8),
+                     move=np.array([row[2] for row in rows], dtype=np.uint8),
+                     score=np.array([row[3] for row in rows], dtype=np.float32),
+                     result=(np.array([row[4] for row in rows], dtype=np.float32)
+                             / games),
+                     margin=(np.array([row[5] for row in rows], dtype=np.float32)
+                             / games),
+                     count=counts,
+                     games=np.array(self.games),
+                     variant=np.array([variant.pits, variant.stones, variant.flags],
+                                      dtype=np.uint8))
+        self.written.update(keys)
+        self.rows = {}
+        self.shard += 1
+
+
+def generate(roster, games, directory, depth=DEPTH, shard_size=SHARD_SIZE,
+             processes=None, seed=SEED, variant=STANDARD):
+    """ Plays games self-play games across a process pool and writes
+    their positions to shards in directory.
+
+    Returns: the ShardWriter, with its position and duplicate counts.
+    """
+    writer = ShardWriter(directory, shard_size, variant)
+    start = time.time()
+    pool = multiprocessing.Pool(processes)
+    try:
+        # Games come back in order, so every shard holds all the games
+        # up to its games count and a rerun can start after them.
+        tasks = game_tasks(roster, games, depth, seed, variant, writer.games)
+        for game, positions in enumerate(pool.imap(play_game, tasks, CHUNK_SIZE)):
+            writer.add(positions)
+            if (game + 1) % 1000 == 0:
+                print "%d games, %d positions, %.1f positions/sec" % (
+                    game + 1, writer.positions,
+                    writer.positions / (time.time() - start))
+        writer.flush()
+    finally:
+        pool.close()
+        pool.join()
+    return writer
+
+
+def main():
+    """ Generates training data from the command line. """
+    from tournament import PROFILES
+    parser = argparse.ArgumentParser(description="Generate self-play training data.")
+    parser.add_argument('games', type=int)
+    parser.add_argument('directory')
+    parser.add_argument('profiles', nargs='+', choices=('M', 'H', 'E', 'N'))
+    parser.add_argument('-d', '--depth', type=int, default=DEPTH)
+    parser.add_argument('-s', '--shard-size', type=int, default=SHARD_SIZE,
+                        help="unique positions per shard")
+    parser.add_argument('-p', '--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    start = time.time()
+    writer = generate([PROFILES[p] for p in args.profiles], args.games,
+                      args.directory, args.depth, args.shard_size,
+                      args.processes, args.seed)
+    print "Wrote %d positions (%d duplicates dropped), %d shards in %s, %.1f sec" % (
+        writer.positions - writer.duplicates, writer.duplicates, writer.shard,
+        args.directory, time.time() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+""" Match server hosting many games against the AI profiles at once.
+
+Each TCP connection is one match between the client and an AI. One
+event loop (asyncore, polling) serves every connection, and AI moves
+are searched in a process pool, so no search or sleep ever holds up
+the other matches. Searches go through a MoveService, which shares
+one search between games asking about the same position and caches
+the results.
+
+Every AI move has a time budget: searching profiles are told to
+deepen iteratively within it, and a move not back in time (plus some
+grace) is replaced with a random eligible move. Clients can likewise
+be given a time limit per move, after which they forfeit the match.
+
+The protocol is line based. Pits are numbered from 1 as in play.py.
+
+    client: NEW PROFILE [SEAT]   start a match against R, M, H, C, E or N,
+                                 moving first (SEAT 1, the default) or
+                                 second (SEAT 2)
+    client: MOVE PIT             move from PIT on your turn
+    client: BOARD                ask for the board again
+    client: STATS                ask for the move service metrics
+    client: QUIT                 end the session
+    server: GAME ID SEAT         a match has started
+    server: BOARD CELLS TURN     FlatBoard cells, comma separated, and
+                                 the player to move
+    server: MOVED PLAYER PIT     a move was played
+    server: TIMEOUT PLAYER       the player ran out of time
+    server: OVER SCORE1 SCORE2   the match has ended
+    server: STATS NAME=COUNT...  move service metrics
+    server: ERROR MESSAGE        the last command was refused
+
+Usage: python server.py [PORT] [PROCESSES]
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import asynchat
+import asyncore
+import itertools
+import random
+import socket
+import sys
+import time
+
+from flatboard import FlatBoard
+from moveservice import MoveService
+from search import flip_number
+from tournament import PROFILES
+from variants import STANDARD
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Milliseconds each AI move may take, and the extra time allowed for
+# passing the search to and from a worker before a random move is
+# played instead.
+AI_BUDGET = 1000
+AI_GRACE = 500
+# Seconds a client may take per move (None for no limit).
+CLIENT_LIMIT = None
+
+# Seconds the event loop waits for network activity before checking
+# for finished searches and expired clocks.
+POLL_INTERVAL = 0.01
+
+
+class MatchSession(asynchat.async_chat):
+    """ One client connection and the match it is playing. """
+
+    def __init__(self, server, sock, session_id):
+        asynchat.async_chat.__init__(self, sock, map=server.socket_map)
+        self.set_terminator("\n")
+        self.server = server
+        self.session_id = session_id
+        self.buffer = []
+        self.position = None
+        self.number = None
+        self.seat = None
+        self.profile_type = None
+        # Number of the AI move being searched, so late results from
+        # an abandoned search are ignored.
+        self.search_id = None
+        # time.time() by which the player to move must move, or None.
+        self.deadline = None
+
+    def collect_incoming_data(self, data):
+        self.buffer.append(data)
+
+    def found_terminator(self):
+        line = "".join(self.buffer).strip()
+        self.buffer = []
+        if not line:
+            return
+        words = line.split()
+        handler = getattr(self, '_cmd_' + words[0].lower(), None)
+        if handler is None:
+            self.send_line("ERROR Unknown command: %s" % words[0])
+            return
+        try:
+            handler(*words[1:])
+        except (TypeError, ValueError) as error:
+            self.send_line("ERROR %s" % error)
+
+    def send_line(self, line):
+        """ Queues line to be sent to the client. """
+        self.push(line + "\n")
+
+    def handle_close(self):
+        self.server.remove_session(self)
+        self.close()
+
+    def _cmd_new(self, letter, seat="1"):
+        """ Starts a match against the AI profile for letter. """
+        if self.position is not None and not self.position.game_over():
+            raise ValueError("A match is in progress")
+        if letter not in PROFILES:
+            raise ValueError("Unknown profile: %s" % letter)
+        seat = int(seat)
+        if seat not in (1, 2):
+            raise ValueError("Seat must be 1 or 2")
+        self.profile_type = PROFILES[letter]
+        self.seat = seat
+        self.position = FlatBoard(variant=self.server.variant)
+        self.number = 1
+        self.send_line("GAME %d %d" % (self.session_id, seat))
+        self._send_board()
+        self._next_turn()
+
+    def _cmd_move(self, pit):
+        """ Plays the client's move from pit (counted from 1). """
+        if self.position is None or self.position.game_over():
+            raise ValueError("No match in progress")
+        if self.number != self.seat:
+            raise ValueError("Not your turn")
+        move = int(pit) - 1
+        if move not in self.position.eligible_moves(self.number):
+            raise ValueError("Invalid move: %s" % pit)
+        self.play(move)
+
+    def _cmd_board(self):
+        """ Sends the board. """
+        if self.position is None:
+            raise ValueError("No match in progress")
+        self._send_board()
+
+    def _cmd_stats(self):
+        """ Sends the move service metrics. """
+        metrics = self.server.moves.metrics
+        self.send_line("STATS " + " ".join("%s=%d" % (name, metrics[name])
+                                           for name in sorted(metrics)))
+
+    def _cmd_quit(self):
+        """ Ends the session. """
+        self.close_when_done()
+        self.server.remove_session(self)
+
+    def _send_board(self):
+        self.send_line("BOARD %s %d" % (",".join(str(stones) for stones in self.position.cells),
+                                        self.number))
+
+    def play(self, move):
+        """ Plays move for the player to move and passes the turn on. """
+        self.search_id = None
+        self.deadline = None
+        free_move, undo = self.position.make_move(self.number, move)
+        self.send_line("MOVED %d %d" % (self.number, move + 1))
+        if not free_move:
+            self.number = flip_number(self.number)
+        self._send_board()
+        self._next_turn()
+
+    def _next_turn(self):
+        """ Ends the match, or starts the next player's clock. """
+        if self.position.game_over():
+            self.send_line("OVER %d %d" % self.position.final_scores())
+        elif self.number == self.seat:
+            if CLIENT_LIMIT is not None:
+                self.deadline = time.time() + CLIENT_LIMIT
+        else:
+            self.deadline = time.time() + (AI_BUDGET + AI_GRACE) / 1000.0
+            self.search_id = self.server.request_move(self)
+
+    def check_clock(self, now):
+        """ Handles the player to move running out of time. """
+        if self.deadline is None or now < self.deadline:
+            return
+        self.send_line("TIMEOUT %d" % self.number)
+        if self.number == self.seat:
+            # The client forfeits: the AI takes every stone.
+            self.deadline = None
+            scores = [0, 0]
+            scores[flip_number(self.seat) - 1] = sum(self.position.cells)
+            self.position = None
+            self.send_line("OVER %d %d" % tuple(scores))
+        else:
+            self.play(random.choice(self.position.eligible_moves(self.number)))
+
+    def receive_move(self, search_id, move):
+        """ Plays an AI move, unless it comes from an abandoned search. """
+        if (move is not None and search_id == self.search_id and
+                self.position is not None):
+            self.play(move)
+
+
+class MatchServer(asyncore.dispatcher):
+    """ Accepts clients and runs the event loop for every match. """
+
+    def __init__(self, host=HOST, port=PORT, processes=None, variant=STANDARD):
+        self.socket_map = {}
+        asyncore.dispatcher.__init__(self, map=self.socket_map)
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.listen(128)
+        self.variant = variant
+        self.moves = MoveService(processes)
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        self.search_ids = itertools.count(1)
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is None:
+            return
+        sock, address = pair
+        session_id = next(self.session_ids)
+        self.sessions[session_id] = MatchSession(self, sock, session_id)
+
+    def remove_session(self, session):
+        """ Forgets a closed session. """
+        self.sessions.pop(session.session_id, None)
+
+    def request_move(self, session):
+        """ Asks the move service for the AI move of a session.
+
+        Returns: the search id the move will come back with.
+        """
+        search_id = next(self.search_ids)
+        session_id = session.session_id
+
+        def done(move):
+            session = self.sessions.get(session_id)
+            if session is not None:
+                session.receive_move(search_id, move)
+
+        self.moves.request(session.profile_type, session.number,
+                           session.position, session.deadline, AI_BUDGET,
+                           AI_GRACE, done)
+        return search_id
+
+    def serve_forever(self):
+        """ Runs the event loop until interrupted. """
+        try:
+            while True:
+                asyncore.loop(POLL_INTERVAL, True, self.socket_map, 1)
+                self.moves.dispatch()
+                now = time.time()
+                for session in self.sessions.values():
+                    session.check_clock(now)
+        finally:
+            self.close()
+            self.moves.close()
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    server = MatchServer(HOST, port, processes)
+    print "Serving matches on %s:%d" % (HOST, port)
+    server.serve_forever()
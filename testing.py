@@ -1,6 +1,13 @@
 from tree import Node
 from board import Board
 from ai_profiles import MinimaxAI
+from flatboard import FlatBoard
+from search import AlphaBetaSearch, flip_number, solved_score
+from variants import REMAINING_TO_EMPTIER, Variant
+import records
+import os
+import random
+import tempfile
 
 def test_tree():
 	board = Board()
@@ -9,8 +16,109 @@ def test_tree():
 
 
 	print "FINAL:"
-	print tree.print_tree(0)
+	for text in tree.walk_tree(0):
+		print text,
+	print
+
+
+def test_finished_games():
+	""" Checks that searches score a game ended before the depth runs
+	out exactly, whatever the depth.
+	"""
+	# Player 1's only move, pit 5, ends the game 31 to 13.
+	cells = [0, 0, 0, 0, 0, 2, 30, 0, 0, 0, 0, 0, 8, 4]
+	ai = MinimaxAI(1, None)
+	for depth in range(1, 5):
+		result = ai.make_engine().search(FlatBoard(cells=cells), 1, depth)
+		assert result == (solved_score(18), 5), (depth, result)
+		tree = Node(FlatBoard(cells=cells), True, 1, depth)
+		assert ai.minimax(tree) == (solved_score(18), 5), (depth, ai.minimax(tree))
+	print "Finished games: scored exactly at depths 1-4"
+
+
+def test_records():
+	""" Checks that game records read back and replay as written, and
+	that a record cut short ends the reading cleanly.
+	"""
+	rng = random.Random(1)
+	variants = [Variant(), Variant(4, 3, empty_capture=True),
+		Variant(5, 5, remaining=REMAINING_TO_EMPTIER), Variant(6, 30)]
+	games = []
+	for game in range(300):
+		variant = variants[game % len(variants)]
+		position = FlatBoard(variant=variant)
+		number = 1
+		moves = []
+		while not position.game_over():
+			move = rng.choice(position.eligible_moves(number))
+			free_move, undo = position.make_move(number, move)
+			moves.append((number, move, free_move))
+			if not free_move:
+				number = flip_number(number)
+		games.append(records.GameRecord(variant, (u"P%d" % game, u"\u00e9"), moves,
+			tuple(position.final_scores())))
+
+	handle, filename = tempfile.mkstemp(suffix=".rec")
+	os.close(handle)
+	os.remove(filename)
+	try:
+		with records.RecordWriter(filename) as writer:
+			for record in games:
+				writer.write(record)
+		count = 0
+		for record, expected in zip(records.read_records(filename), games):
+			assert record.variant == expected.variant, (count, record.variant)
+			assert record.players == expected.players, (count, record.players)
+			assert record.moves == expected.moves, count
+			assert record.scores == expected.scores, (count, record.scores)
+			for position, number, move in record.replay():
+				assert move in position.eligible_moves(number), (count, number, move)
+			assert position.game_over() and tuple(position.final_scores()) == record.scores, count
+			count += 1
+		assert count == len(games), count
+
+		# A writer stopped mid-record leaves part of it at the end.
+		with open(filename, 'ab') as f:
+			f.write(records.encode_record(games[0])[:-3])
+		count = sum(1 for record in records.read_records(filename))
+		assert count == len(games), count
+	finally:
+		os.remove(filename)
+	print "Records: %d games read back and replayed" % len(games)
+
+
+def test_batched_leaves():
+	""" Checks that scoring leaves in batches changes no search result. """
+	from neural import Network, NetworkEvaluator
+	rng = random.Random(1)
+	network = Network.random((16, 16))
+	searches = 0
+	for trial in range(200):
+		position = FlatBoard()
+		number = 1
+		for _ in range(rng.randint(0, 30)):
+			if position.game_over():
+				break
+			free_move, undo = position.make_move(number, rng.choice(position.eligible_moves(number)))
+			if not free_move:
+				number = flip_number(number)
+		if position.game_over():
+			continue
+		depth = rng.randint(1, 4)
+		for extend_free_moves in (False, True):
+			evaluate = NetworkEvaluator(number, network)
+			batched = AlphaBetaSearch(evaluate, extend_free_moves)
+			single = AlphaBetaSearch(evaluate, extend_free_moves)
+			single.evaluate_batch = None
+			expected = single.search(position.copy(), number, depth)
+			result = batched.search(position.copy(), number, depth)
+			assert result == expected, (position.cells.tolist(), number, depth, result, expected)
+			searches += 1
+	print "Batched leaves: %d searches agree" % searches
 
 
 if __name__ == '__main__':
-	test_tree()
\ No newline at end of file
+	test_tree()
+	test_finished_games()
+	test_records()
+	test_batched_leaves()
\ No newline at end of file
@@ -0,0 +1,176 @@
+""" Tournament runner playing AI matches across a process pool.
+
+Games are played headless in worker processes and their CSV lines
+are streamed back to a single writer in the parent, which holds the
+results file open for the whole run. Each line carries the search
+stats of both players added up over the game. The moves of every game
+are appended to a game records file (see records.py) alongside.
+
+Usage: python tournament.py GAMES PROFILE PROFILE [PROFILE ...]
+where each PROFILE is R (Random), M (Minimax), H (HillSearch),
+C (MonteCarlo), E (Heuristic) or N (Neural).
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from mancala import Match
+from records import GameRecord, RecordWriter, encode_record
+from ai_profiles import HeuristicAI, HillSearchAI, MinimaxAI, MonteCarloAI, \
+    NeuralAI, RandomAI
+from search import SearchStats
+
+FILENAME = "data_rm.csv"
+RECORDS = "games.rec"
+# Per player search stats columns, after the game columns.
+STATS_COLUMNS = ("Nodes", "Evaluated", "Cutoffs", "TTHits", "MaxDepth", "EBF",
+                 "MoveTime")
+HEADER = ("Player1,Player2,Winner,Score,Diff,Time,NumTurns," +
+          ",".join(["P1" + column for column in STATS_COLUMNS] +
+                   ["P2" + column for column in STATS_COLUMNS]) + "\n")
+
+# Command line letters for each AI profile.
+PROFILES = {'R': RandomAI, 'M': MinimaxAI, 'H': HillSearchAI, 'C': MonteCarloAI,
+            'E': HeuristicAI, 'N': NeuralAI}
+
+
+def type_to_string(t):
+    """ Returns the name used in results files for an AI profile. """
+    if t is HillSearchAI:
+        return "HillSearch"
+    elif t is MinimaxAI:
+        return "Minimax"
+    elif t is RandomAI:
+        return "Random"
+    elif t is MonteCarloAI:
+        return "MonteCarlo"
+    elif t is HeuristicAI:
+        return "Heuristic"
+    elif t is NeuralAI:
+        return "Neural"
+    else:
+        return "Unknown Type"
+
+
+def round_robin(roster, games):
+    """ Returns (p1_type, p2_type) pairings where every profile in
+    roster plays games games against every other, in both seats.
+    """
+    pairings = []
+    for p1_type in roster:
+        for p2_type in roster:
+            if p1_type is not p2_type:
+                pairings.extend([(p1_type, p2_type)] * games)
+    return pairings
+
+
+def _init_worker():
+    """ Pool initializer giving each worker its own random sequence. """
+    random.seed()
+
+
+def stats_fields(player):
+    """ Returns the stats columns for a player's moves in a game. Players
+    that do not search get empty columns.
+    """
+    move_stats = getattr(player, 'move_stats', None)
+    if not move_stats:
+        return [""] * len(STATS_COLUMNS)
+    total = SearchStats.combine(move_stats)
+    return [str(total.generated), str(total.evaluated), str(total.cutoffs),
+            str(total.tt_hits), str(total.max_depth),
+            "%.3f" % total.branching_factor,
+            "%.4f" % (total.elapsed / total.searches)]
+
+
+def play_game(pairing):
+    """ Plays one match and returns its results file line and its
+    encoded game record.
+    """
+    p1_type, p2_type = pairing
+    start = time.time()
+
+    match = Match(player1_type=p1_type, player2_type=p2_type, headless=True)
+    result = match.play()
+    p1_score, p2_score = result.scores
+
+    elapsed = time.time() - start
+
+    if p1_score > p2_score:
+        if p1_type is RandomAI and p2_type is RandomAI:
+            winner = "Player1"
+        else:
+            winner = type_to_string(p1_type)
+    else:
+        if p1_type is RandomAI and p2_type is RandomAI:
+            winner = "Player2"
+        else:
+            winner = type_to_string(p2_type)
+
+    score = str(p1_score) + " - " + str(p2_score)
+    diff = p1_score - p2_score
+    line = (type_to_string(p1_type) + "," + type_to_string(p2_type) + "," +
+            str(winner) + "," + score + "," + str(abs(diff)) + "," +
+            "%.3f" % elapsed + "," + str(result.num_turns) + "," +
+            ",".join(stats_fields(match.player1) + stats_fields(match.player2)) +
+            "\n")
+    players = (type_to_string(p1_type), type_to_string(p2_type))
+    record = GameRecord.from_result(result, players, match.board.variant)
+    return line, encode_record(record)
+
+
+def play_pairings(pairings, filename=FILENAME, processes=None, records=None):
+    """ Plays one game per pairing across a process pool, appending a
+    line per game to filename as each game finishes, and its game
+    record to the records file when one is given.
+
+    Returns: games played per second.
+    """
+    start = time.time()
+    new_file = not os.path.isfile(filename) or not os.path.getsize(filename)
+    if not new_file:
+        with open(filename) as f:
+            header = f.readline()
+        if header != HEADER:
+            raise ValueError("%s has different columns; move it aside or "
+                             "choose another file" % filename)
+    pool = multiprocessing.Pool(processes, _init_worker)
+    writer = RecordWriter(records) if records else None
+    try:
+        with open(filename, "a") as f:
+            if new_file:
+                f.write(HEADER)
+            for line, record in pool.imap_unordered(play_game, pairings):
+                f.write(line)
+                f.flush()
+                if writer is not None:
+                    writer.write(record)
+    finally:
+        if writer is not None:
+            writer.close()
+        pool.close()
+        pool.join()
+
+    elapsed = time.time() - start
+    return len(pairings) / elapsed if elapsed else 0.0
+
+
+def run_tournament(roster, games, filename=FILENAME, processes=None,
+                   records=RECORDS):
+    """ Plays a full round robin of roster and reports throughput. """
+    pairings = round_robin(roster, games)
+    rate = play_pairings(pairings, filename, processes, records)
+    print "Played %d games (%.2f games/sec)" % (len(pairings), rate)
+    return rate
+
+
+if __name__ == '__main__':
+    num_games = int(sys.argv[1])
+    run_tournament([PROFILES[p] for p in sys.argv[2:]], num_games)
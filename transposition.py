@@ -0,0 +1,89 @@
+""" Module for Zobrist hashing and the search transposition table. """
+import random
+
+from constants import TT_ENTRIES, TT_REPLACEMENT
+
+# Bound types of stored values.
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Replacement policies.
+REPLACE_ALWAYS = 'always'
+REPLACE_DEPTH = 'depth'
+
+# Zobrist key sets, keyed by (board size, max stones).
+_ZOBRIST = {}
+
+
+class Zobrist(object):
+    """ Random 64-bit keys for every (slot, stone count) pair plus one
+    per side to move. An empty slot contributes nothing to the hash.
+
+    Keys are seeded by slot, so every process derives the same keys.
+    """
+
+    def __init__(self, size, max_stones):
+        keys = []
+        for slot in range(size):
+            rng = random.Random(size * 1000 + slot)
+            keys.append(tuple([0] + [rng.getrandbits(64) for _ in range(max_stones)]))
+        self.keys = tuple(keys)
+        rng = random.Random(size * 1000 + size)
+        self.side = (None, rng.getrandbits(64), rng.getrandbits(64))
+
+    def hash_cells(self, cells):
+        """ Returns the Zobrist hash of a full array of slots. """
+        key = 0
+        for slot, stones in enumerate(cells):
+            key ^= self.keys[slot][stones]
+        return key
+
+
+def get_zobrist(size, max_stones):
+    """ Returns the (cached) Zobrist keys for a board. """
+    zobrist = _ZOBRIST.get((size, max_stones))
+    if zobrist is None:
+        zobrist = _ZOBRIST[(size, max_stones)] = Zobrist(size, max_stones)
+    return zobrist
+
+
+class TranspositionTable(object):
+    """ Fixed-size table of search results keyed by position hash.
+
+    Each slot holds one (key, depth, bound, value, move, generation)
+    tuple, so max_entries caps the memory used. With the 'depth' policy
+    an entry from the current search is only replaced by one searched
+    at least as deep; the 'always' policy replaces unconditionally.
+    """
+
+    def __init__(self, max_entries=TT_ENTRIES, replacement=TT_REPLACEMENT):
+        if replacement not in (REPLACE_ALWAYS, REPLACE_DEPTH):
+            raise ValueError("Unknown replacement policy: %s" % replacement)
+        self.max_entries = max_entries
+        self.replacement = replacement
+        self.generation = 0
+        self.entries = [None] * max_entries
+
+    def new_search(self):
+        """ Ages existing entries so they can be replaced first. """
+        self.generation += 1
+
+    def clear(self):
+        """ Drops every stored entry. """
+        self.entries = [None] * self.max_entries
+
+    def probe(self, key):
+        """ Returns the entry stored for key, or None. """
+        entry = self.entries[key % self.max_entries]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, bound, value, move):
+        """ Stores a search result subject to the replacement policy. """
+        index = key % self.max_entries
+        old = self.entries[index]
+        if (old is None or old[0] == key or self.replacement == REPLACE_ALWAYS
+                or old[5] != self.generation or depth >= old[1]):
+            self.entries[index] = (key, depth, bound, value, move, self.generation)
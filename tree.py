@@ -1,36 +1,90 @@
+from search import flip_number
+
 class Node(object):
+	""" A game tree node whose children are generated on demand.
 
-	def __init__(self, value, is_max, move):
-		self.value = value
-		self.max = is_max
+	Only the root keeps a board. Every other node keeps its parent and
+	the move that led to it, and replays the moves from the root when
+	its board is needed. Children are not stored, so a subtree can be
+	dropped as soon as it has been scored.
+	"""
+
+	__slots__ = ('parent', 'move', 'max', 'number', 'depth',
+		'extend_free_moves', 'root_position')
+
+	def __init__(self, position, is_max, number, depth, extend_free_moves=False,
+			move=None, parent=None):
+		self.parent = parent
 		self.move = move
-		self.num_children = 0
-		self.children = []
+		self.max = is_max
+		# Player to move at this node.
+		self.number = number
+		# Moves left to search below this node.
+		self.depth = depth
+		self.extend_free_moves = extend_free_moves
+		# FlatBoard of the root, None for every other node.
+		self.root_position = position
 
-	def add_child(self, c):
-		self.num_children += 1
-		self.children.append(c)
+	def position(self):
+		""" Returns a new FlatBoard of this node's board. """
+		path = []
+		node = self
+		while node.parent is not None:
+			path.append((node.parent.number, node.move))
+			node = node.parent
+		position = node.root_position.copy()
+		for number, move in reversed(path):
+			position.make_move(number, move)
+		return position
 
-	def set_move(self, m):
-		self.move = m
+	@property
+	def value(self):
+		""" This node's board as a nested Board.board state. """
+		return self.position().to_board()
+
+	@property
+	def children(self):
+		""" Generates a child node per eligible move, none past the
+		search depth or once the game is over.
+		"""
+		if self.depth == 0:
+			return
+		position = self.position()
+		if position.game_over():
+			return
+		for move in position.eligible_moves(self.number):
+			free_move, undo = position.make_move(self.number, move)
+			position.unmake_move(undo)
+			if free_move:
+				depth = self.depth if self.extend_free_moves else self.depth - 1
+				yield Node(None, self.max, self.number, depth,
+					self.extend_free_moves, move, self)
+			else:
+				yield Node(None, not self.max, flip_number(self.number),
+					self.depth - 1, self.extend_free_moves, move, self)
 
 	def print_value(self, board, sep):
-		return " %s%d  %d  %d  %d  %d  %d\n %s%d                    %d\n  %s%d  %d  %d  %d  %d  %d\n" % (
+		p2_pits = "  ".join(["%d" % stones for stones in reversed(board[2])])
+		p1_pits = "  ".join(["%d" % stones for stones in board[0]])
+		gap = " " * (len(board[0]) * 3 + 2)
+		return " %s%s\n %s%d%s%d\n  %s%s\n" % (
                # Player 2 pits in top row
-               sep, board[2][5], board[2][4], board[2][3],
-               board[2][2], board[2][1], board[2][0],
+               sep, p2_pits,
                # Player 2 & 1 stores in middle row
-               sep, board[3][0], board[1][0],
+               sep, board[3][0], gap, board[1][0],
                # Player 1 pits on bottom row
-               sep, board[0][0], board[0][1], board[0][2],
-               board[0][3], board[0][4], board[0][5])
+               sep, p1_pits)
 
-	def print_tree(self, level):
+	def walk_tree(self, level):
+		""" Generates the printed board of every node, depth first. """
 		tabs = "\t"*level
-		ret = (self.print_value(self.value, tabs)) +"\n"
+		yield (self.print_value(self.value, tabs)) +"\n"
 		for child in self.children:
-			ret += child.print_tree(level+1)
-		return ret
+			for text in child.walk_tree(level+1):
+				yield text
+
+	def print_tree(self, level):
+		return "".join(self.walk_tree(level))
 		# ret = tabs + str(self.move) + "\n"
 		# for child in self.children:
 		# 	ret += child.print_tree(level+1)
@@ -0,0 +1,240 @@
+""" SPSA tuning of the HeuristicAI evaluation weights by self-play.
+
+Every iteration perturbs all tuned weights at once by a random +-c
+step, plays game pairs between the two perturbed weight sets across a
+process pool and moves the weights towards whichever side scored
+better. Each pair starts from the same random opening and swaps seats,
+so neither side gains from the opening or from moving first.
+
+Games are played directly on EvalBoards with AlphaBetaSearch engines
+rather than through Match, which keeps each game cheap enough for the
+tens of thousands of games a tuning run needs.
+
+A checkpoint file is written as JSON after every iteration. Running
+again with the same checkpoint resumes from it, with the pairs per
+iteration and depth it was started with, and since each
+iteration's random choices come from the seed and iteration number a
+resumed run plays the same games it would have without stopping.
+
+Usage: python tuner.py ITERATIONS [-c CHECKPOINT] [-g PAIRS] [-d DEPTH]
+                       [-p PROCESSES]
+"""
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from constants import EVAL_WEIGHTS
+from evaluation import FEATURES, EvalBoard, Evaluator
+from mcts import reward
+from search import AlphaBetaSearch, flip_number
+from transposition import TranspositionTable
+from variants import STANDARD
+
+CHECKPOINT = "tuner.json"
+SEED = 1
+
+# Game pairs per iteration, search depth and random opening moves.
+PAIRS = 32
+DEPTH = 4
+OPENING_MOVES = 4
+# Transposition table slots for each player of a self-play game.
+TABLE_ENTRIES = 2 ** 14
+
+# Weights tuned, as FEATURES indexes. store_diff stays fixed to set
+# the scale of the others.
+TUNED = (1, 2, 3, 4)
+
+# SPSA gain sequences: a_k = A_GAIN / (k + 1 + A_OFFSET) ** ALPHA and
+# c_k = C_GAIN / (k + 1) ** GAMMA.
+A_GAIN = 0.5
+A_OFFSET = 50
+ALPHA = 0.602
+C_GAIN = 0.1
+GAMMA = 0.101
+
+
+def random_opening(rng, moves=OPENING_MOVES, variant=STANDARD):
+    """ Returns (cells, player to move) after moves random moves from
+    the start, or from the last position before the game would end.
+    """
+    position = EvalBoard(variant=variant)
+    number = 1
+    for _ in range(moves):
+        move = rng.choice(position.eligible_moves(number))
+        free_move, undo = position.make_move(number, move)
+        if position.game_over():
+            position.unmake_move(undo)
+            break
+        if not free_move:
+            number = flip_number(number)
+    return position.cells.tolist(), number
+
+
+def play_game(weights1, weights2, opening, depth=DEPTH, variant=STANDARD):
+    """ Plays a game between two weight sets from opening, a (cells,
+    player to move) pair.
+
+    Returns: final (player 1, player 2) scores.
+    """
+    cells, number = opening
+    position = EvalBoard(cells=cells, variant=variant)
+    engines = [None]
+    for player, weights in ((1, weights1), (2, weights2)):
+        engines.append(AlphaBetaSearch(Evaluator(player, weights),
+                                       table=TranspositionTable(TABLE_ENTRIES)))
+    for number, move, score in play_moves(position, number, engines, depth):
+        pass
+    return position.final_scores()
+
+
+def play_moves(position, number, engines, depth):
+    """ Plays position out from player number to move, each player's
+    engine in engines (indexed by player number) searching depth.
+
+    Yields (number, move, score) for every move before it is made.
+    """
+    while not position.game_over():
+        score, move = engines[number].search(position, number, depth)
+        yield number, move, score
+        free_move, undo = position.make_move(number, move)
+        if not free_move:
+            number = flip_number(number)
+
+
+def play_pair(task):
+    """ Worker entry point. Plays plus against minus from one opening in
+    both seats and returns plus's points, out of 2.
+    """
+    plus, minus, opening, depth = task
+    points = reward(play_game(plus, minus, opening, depth), 1)
+    points += reward(play_game(minus, plus, opening, depth), 2)
+    return points
+
+
+class Tuner(object):
+    """ An SPSA tuning run, resumable from its checkpoint file. """
+
+    def __init__(self, checkpoint=CHECKPOINT, pairs=None, depth=None,
+                 processes=None, seed=SEED):
+        """ pairs and depth default to the checkpoint's when resuming,
+        else to PAIRS and DEPTH; given values must match the checkpoint's.
+        """
+        self.checkpoint = checkpoint
+        self.pairs = pairs
+        self.depth = depth
+        self.processes = processes
+        self.seed = seed
+        self.iteration = 0
+        self.weights = list(EVAL_WEIGHTS)
+        # (iteration, plus points fraction, weights after) per iteration.
+        self.history = []
+        if os.path.isfile(checkpoint):
+            self.load()
+        if self.pairs is None:
+            self.pairs = PAIRS
+        if self.depth is None:
+            self.depth = DEPTH
+
+    def load(self):
+        """ Restores the run from the checkpoint file. """
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        if state['features'] != list(FEATURES):
+            raise ValueError("Checkpoint is for features %s" % state['features'])
+        for name in ('pairs', 'depth'):
+            value = getattr(self, name)
+            if value is not None and value != state[name]:
+                raise ValueError("Checkpoint was run with %s %d, not %d" %
+                                 (name, state[name], value))
+            setattr(self, name, state[name])
+        self.iteration = state['iteration']
+        self.weights = state['weights']
+        self.seed = state['seed']
+        self.history = state['history']
+
+    def save(self):
+        """ Writes the checkpoint file, replacing it only once written. """
+        state = {
+            'features': list(FEATURES),
+            'iteration': self.iteration,
+            'weights': self.weights,
+            'seed': self.seed,
+            'pairs': self.pairs,
+            'depth': self.depth,
+            'history': self.history,
+        }
+        temporary = self.checkpoint + ".tmp"
+        with open(temporary, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.rename(temporary, self.checkpoint)
+
+    def step(self, pool):
+        """ Runs one SPSA iteration on pool and saves the checkpoint. """
+        k = self.iteration
+        rng = random.Random(self.seed * 1000003 + k)
+        a_k = A_GAIN / (k + 1 + A_OFFSET) ** ALPHA
+        c_k = C_GAIN / (k + 1) ** GAMMA
+
+        delta = [0] * len(FEATURES)
+        for index in TUNED:
+            delta[index] = rng.choice((-1, 1))
+        plus = [w + c_k * d for w, d in zip(self.weights, delta)]
+        minus = [w - c_k * d for w, d in zip(self.weights, delta)]
+
+        tasks = [(plus, minus, random_opening(rng), self.depth)
+                 for _ in range(self.pairs)]
+        points = sum(pool.imap_unordered(play_pair, tasks))
+        # Plus's result from -1 (lost every game) to 1 (won every game).
+        result = points / self.pairs - 1.0
+
+        for index in TUNED:
+            self.weights[index] += a_k * result / (2 * c_k * delta[index])
+        self.iteration += 1
+        self.history.append((k, points / (2.0 * self.pairs), list(self.weights)))
+        self.save()
+        return result
+
+    def run(self, iterations):
+        """ Runs until iterations iterations are done in total. """
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            while self.iteration < iterations:
+                start = time.time()
+                result = self.step(pool)
+                elapsed = time.time() - start
+                print "Iteration %d: plus %+.3f, %.1f games/sec, weights %s" % (
+                    self.iteration, result, 2 * self.pairs / elapsed,
+                    ", ".join("%.3f" % w for w in self.weights))
+        finally:
+            pool.close()
+            pool.join()
+        return self.weights
+
+
+def main():
+    """ Runs a tuning session from the command line. """
+    parser = argparse.ArgumentParser(description="Tune evaluation weights by self-play.")
+    parser.add_argument('iterations', type=int, help="total iterations to reach")
+    parser.add_argument('-c', '--checkpoint', default=CHECKPOINT)
+    parser.add_argument('-g', '--pairs', type=int, default=None,
+                        help="game pairs per iteration (default %d)" % PAIRS)
+    parser.add_argument('-d', '--depth', type=int, default=None,
+                        help="search depth (default %d)" % DEPTH)
+    parser.add_argument('-p', '--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    tuner = Tuner(args.checkpoint, args.pairs, args.depth, args.processes)
+    weights = tuner.run(args.iterations)
+    print "EVAL_WEIGHTS = (%s)" % ", ".join("%.3f" % w for w in weights)
+
+
+if __name__ == '__main__':
+    main()
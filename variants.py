@@ -0,0 +1,127 @@
+""" Module for Mancala rule variants and their precomputed tables.
+
+A Variant fixes the pits per player, the starting stones per pit and
+the rules that differ between rule sets. Its sowing tables are built
+once per pit count and shared, so boards of any variant move stones
+through the same table lookups as the standard game.
+"""
+
+# Where stones left on the board go once a player's pits are empty.
+REMAINING_TO_OWNER = 'owner' # each player gathers their own pits
+REMAINING_TO_EMPTIER = 'emptier' # the player who ran out takes them all
+
+# Sowing tables, keyed by pit count.
+_TABLES = {}
+
+
+def _build_tables(pits):
+    """ Returns the sowing tables for a board with pits per player. """
+    size = pits * 2 + 2
+    stores = (None, pits, size - 1)
+    offsets = (None, 0, pits + 1)
+
+    # sow[number][index] is the cycle of slots a stone picked up from
+    # index passes through, skipping the opposing store. The cycle ends
+    # back at the starting pit.
+    sow = [None, [], []]
+    for number in (1, 2):
+        skip = stores[3 - number]
+        for index in range(pits):
+            start = offsets[number] + index
+            cycle = []
+            slot = start
+            while len(cycle) < size - 1:
+                slot = (slot + 1) % size
+                if slot != skip:
+                    cycle.append(slot)
+            sow[number].append(tuple(cycle))
+
+    # opposite[slot] is the pit facing slot across the board.
+    opposite = [None] * size
+    for index in range(pits):
+        opposite[index] = size - 2 - index
+        opposite[size - 2 - index] = index
+
+    # owner[slot] is the number of the player whose pit slot is.
+    owner = [0] * size
+    for index in range(pits):
+        owner[offsets[1] + index] = 1
+        owner[offsets[2] + index] = 2
+
+    return {'size': size, 'stores': stores, 'offsets': offsets,
+            'sow': sow, 'opposite': tuple(opposite), 'owner': tuple(owner)}
+
+
+def get_tables(pits):
+    """ Returns the (cached) sowing tables for pits per player. """
+    tables = _TABLES.get(pits)
+    if tables is None:
+        tables = _TABLES[pits] = _build_tables(pits)
+    return tables
+
+
+class Variant(object):
+    """ A Mancala rule set.
+
+    pits: pits per player
+    stones: stones per pit at the start
+    empty_capture: when set, a last stone in an empty pit of one's own
+        is captured even if the opposite pit is empty
+    remaining: REMAINING_TO_OWNER or REMAINING_TO_EMPTIER
+    """
+
+    def __init__(self, pits=6, stones=4, empty_capture=False,
+                 remaining=REMAINING_TO_OWNER):
+        if remaining not in (REMAINING_TO_OWNER, REMAINING_TO_EMPTIER):
+            raise ValueError("Unknown remaining stones rule: %s" % remaining)
+        self.pits = pits
+        self.stones = stones
+        self.empty_capture = empty_capture
+        self.remaining = remaining
+        self.tables = get_tables(pits)
+
+    def __eq__(self, other):
+        return (isinstance(other, Variant) and self.stones == other.stones
+                and self.same_rules(other))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "Variant(%d, %d, empty_capture=%r, remaining=%r)" % (
+            self.pits, self.stones, self.empty_capture, self.remaining)
+
+    def same_rules(self, other):
+        """ Returns whether other plays the same game from any position. """
+        return (self.pits == other.pits and
+                self.empty_capture == other.empty_capture and
+                self.remaining == other.remaining)
+
+    @property
+    def flags(self):
+        """ The rules packed into an integer, for file headers. """
+        return (int(self.empty_capture) |
+                (2 if self.remaining == REMAINING_TO_EMPTIER else 0))
+
+    @classmethod
+    def from_flags(cls, pits, stones, flags):
+        """ Returns the variant packed by flags. """
+        if flags & 2:
+            remaining = REMAINING_TO_EMPTIER
+        else:
+            remaining = REMAINING_TO_OWNER
+        return cls(pits, stones, bool(flags & 1), remaining)
+
+    def final_scores(self, p1_store, p1_remaining, p2_store, p2_remaining):
+        """ Returns final (player 1, player 2) scores once either
+        player's pits are empty, given stores and stones left in pits.
+        """
+        if self.remaining == REMAINING_TO_OWNER:
+            return p1_store + p1_remaining, p2_store + p2_remaining
+        if not p1_remaining:
+            return p1_store + p2_remaining, p2_store
+        return p1_store, p2_store + p1_remaining
+
+
+# The standard game: six pits of four stones.
+STANDARD = Variant()